@@ -1,5 +1,6 @@
 import sys
 import os
+import threading
 from flask import Flask, request
 
 # ==============================================================================
@@ -10,7 +11,7 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # Imports con manejo de errores para darte pistas si algo falla
 try:
-    from config import ConfigSingleton
+    from config import CONFIG
     from proxy.proxy_subject import ProxySubject
     from ui.mediator import UIMediator
 except ImportError as e:
@@ -32,8 +33,8 @@ app = Flask(__name__, template_folder="ui/templates")
 def init_system():
     print("--- 🚀 Arrancando RepoAnalyzer ---")
     
-    # 1. Cargar Configuración
-    ConfigSingleton.get_instance()
+    # 1. Configuración (ya cargada al importar config)
+    print(f"Configuración: {CONFIG.as_dict()}")
 
     # 2. Instanciar Proxy (Negocio + BD + Repo)
     # Este objeto ya crea internamente DBManager y RepoManager
@@ -46,20 +47,34 @@ def init_system():
     print("--- ✅ Sistema Listo en http://127.0.0.1:5000 ---")
     return mediator
 
-# Instancia global del mediador
-mediator_instance = init_system()
+# Instancia global del mediador: se crea en la primera petición, no al importar
+# (así los procesos hijos del pool y los imports de tests no arrancan BD ni Proxy)
+_mediator = None
+_mediator_lock = threading.Lock()
+
+def get_mediator():
+    """Devuelve el mediador, inicializando el sistema una única vez (thread-safe)."""
+    global _mediator
+    if _mediator is None:
+        with _mediator_lock:
+            if _mediator is None:
+                _mediator = init_system()
+    return _mediator
 
 # ==============================================================================
 # 4. RUTAS
 # ==============================================================================
 
+# Vistas síncronas: Flask ejecuta una vista async con async_to_sync en el mismo hilo
+# de la petición, así que no atendería más peticiones a la vez, solo añadiría un salto
+# de hilo. La concurrencia la da el servidor WSGI, que atiende cada petición en su hilo.
 @app.route("/", methods=["GET"])
 def index():
-    return mediator_instance.show_index()
+    return get_mediator().show_index()
 
 @app.route("/analyze", methods=["POST"])
 def analyze():
-    return mediator_instance.handle_analyze(request.form)
+    return get_mediator().handle_analyze(request.form)
 
 # ==============================================================================
 # MAIN
@@ -3,6 +3,7 @@ from typing import Optional
 
 class ConfigSingleton:
     _instance: Optional["ConfigSingleton"] = None  # Inicializar a None
+    __slots__ = ("repo_cache_dir", "db_path", "duplication_window")
 
     def __init__(self,
                  repo_cache_dir: Path | str,
@@ -16,6 +17,12 @@ class ConfigSingleton:
         self.db_path = Path(db_path)
         self.duplication_window = duplication_window
 
+    def __setattr__(self, name, value):
+        """La configuración es inmutable: cada campo solo se asigna una vez (en __init__)."""
+        if hasattr(self, name):
+            raise AttributeError(f"La configuración es de solo lectura: no se puede modificar '{name}'.")
+        super().__setattr__(name, value)
+
     @staticmethod
     def get_instance() -> "ConfigSingleton":
         """Obtiene la instancia única (Lazy Initialization)."""
@@ -33,3 +40,7 @@ class ConfigSingleton:
             "db_path": str(self.db_path),
             "duplication_window": self.duplication_window
         }
+
+# Instancia única enlazada a un nombre de módulo: `from config import CONFIG`
+# evita la llamada a get_instance() en cada acceso.
+CONFIG = ConfigSingleton.get_instance()
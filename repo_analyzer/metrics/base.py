@@ -1,5 +1,11 @@
+import ast
+import io
+import tokenize
 from abc import ABC, abstractmethod
-from typing import Any
+from collections import deque
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, List, Optional
 
 class MetricStrategy(ABC):
     """
@@ -19,4 +25,188 @@ class MetricStrategy(ABC):
         Returns:
             El resultado de la métrica.
         """
-        pass
\ No newline at end of file
+        pass
+
+# Nodos que buscan las estrategias de funciones, clases e imports. Las tuplas se construyen
+# una sola vez aquí en lugar de en cada iteración de los bucles sobre el AST
+FUNCTION_NODES = (ast.FunctionDef, ast.AsyncFunctionDef)
+DEFINITION_NODES = FUNCTION_NODES + (ast.ClassDef,)
+IMPORT_NODES = (ast.Import, ast.ImportFrom)
+# Versión para comparar con type(): más barato que isinstance en el recorrido
+_DEFINITION_TYPES = frozenset(DEFINITION_NODES)
+_FUNCTION_TYPES = frozenset(FUNCTION_NODES)
+_IMPORT_TYPES = frozenset(IMPORT_NODES)
+
+def definition_nodes(tree: ast.AST) -> List[ast.AST]:
+    """
+    Devuelve los nodos def/class del árbol, en el orden de ast.walk.
+    El recorrido se hace una sola vez por árbol y se guarda en el propio nodo raíz,
+    de modo que FunctionsStrategy, ClassesStrategy y NumImportsStrategy comparten la misma pasada.
+    En la misma pasada cada nodo recibe su nombre cualificado en `_qualname`
+    (como __qualname__: "Outer.Inner", "factory.<locals>.Handler").
+    """
+    nodes = getattr(tree, "_definition_nodes", None)
+    if nodes is None:
+        _index_tree(tree)
+        nodes = tree._definition_nodes
+    return nodes
+
+def num_import_nodes(tree: ast.AST) -> int:
+    """
+    Devuelve el número de sentencias import / from ... import del árbol,
+    contadas en la misma pasada que definition_nodes.
+    """
+    if getattr(tree, "_definition_nodes", None) is None:
+        _index_tree(tree)
+    return tree._num_imports
+
+def _index_tree(tree: ast.AST) -> None:
+    """Recorre el árbol una vez y guarda en la raíz los nodos def/class y el número de imports."""
+    nodes = []
+    imports = 0
+    # Mismo recorrido en anchura que ast.walk, arrastrando el prefijo del ámbito;
+    # los hijos se leen de _fields directamente (como ast.iter_child_nodes)
+    pending = deque([(tree, "")])
+    pop, push = pending.popleft, pending.append
+    while pending:
+        node, prefix = pop()
+        node_type = type(node)
+        if node_type in _DEFINITION_TYPES:
+            node._qualname = qualname = prefix + node.name
+            nodes.append(node)
+            prefix = qualname + (".<locals>." if node_type in _FUNCTION_TYPES else ".")
+        elif node_type in _IMPORT_TYPES:
+            imports += 1
+            continue  # Sus hijos (alias) no contienen más sentencias
+        for field in node._fields:
+            value = getattr(node, field, None)
+            if isinstance(value, ast.AST):
+                push((value, prefix))
+            elif isinstance(value, list):
+                for child in value:
+                    if isinstance(child, ast.AST):
+                        push((child, prefix))
+    tree._num_imports = imports
+    tree._definition_nodes = nodes
+
+def read_source(filepath, errors: str = "ignore") -> str:
+    """
+    Lee un fichero de código fuente como texto.
+    'utf-8-sig' descarta el BOM inicial si lo hay (con 'utf-8' se queda como U+FEFF
+    y ast.parse falla) en la misma y única decodificación.
+    """
+    return Path(filepath).read_text(encoding="utf-8-sig", errors=errors)
+
+def parse_source(source: str) -> Optional[ast.AST]:
+    """
+    Parsea el código fuente a un AST. Devuelve None si el código no es Python válido
+    (ValueError: bytes nulos en versiones antiguas de Python).
+    """
+    try:
+        return ast.parse(source)
+    except (SyntaxError, ValueError):
+        return None
+
+# Árboles recordados por compute(source) de las estrategias AST
+PARSE_CACHE_SIZE = 64
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_source_cached(source: str) -> Optional[ast.AST]:
+    """
+    parse_source memoizado por el texto del código: si varias estrategias AST reciben
+    el mismo código (o se repite la entrada) se parsea una sola vez y comparten el árbol.
+    Solo lo usa compute(source); la fachada parsea cada fichero una vez por su cuenta
+    y así no retiene fuentes de repos enteros en memoria.
+    """
+    return parse_source(source)
+
+def tokenize_source(source: str) -> Optional[List[tokenize.TokenInfo]]:
+    """
+    Tokeniza el código fuente completo. Devuelve None si el tokenizer falla,
+    para que cada estrategia recurra a su propio tratamiento del error.
+    """
+    try:
+        return list(tokenize.generate_tokens(io.StringIO(source).readline))
+    except (tokenize.TokenError, SyntaxError):
+        return None
+
+
+class FileMetricStrategy(MetricStrategy):
+    """
+    Estrategia que recibe la ruta de un fichero pero solo necesita su contenido.
+    La fachada, que ya ha leído el fichero, llama directamente a compute_from_source
+    y así cada fichero se lee de disco una sola vez.
+    """
+    def compute(self, filepath: Path, **kwargs) -> Any:
+        """
+        Lee el fichero y delega en compute_from_source.
+        """
+        source = read_source(filepath)
+        return self.compute_from_source(source, **kwargs)
+
+    @abstractmethod
+    def compute_from_source(self, source: str, **kwargs) -> Any:
+        """
+        Calcula la métrica a partir del código fuente ya cargado.
+        """
+        pass
+
+
+class LineMetricStrategy(MetricStrategy):
+    """
+    Estrategia que recorre el código fuente línea a línea.
+    La fachada parte cada fichero con splitlines una sola vez y comparte la lista
+    entre todas las estrategias basadas en líneas.
+    """
+    def compute(self, source: str, **kwargs) -> Any:
+        """
+        Parte el código fuente en líneas y delega en compute_lines.
+        """
+        return self.compute_lines(source, source.splitlines(), **kwargs)
+
+    @abstractmethod
+    def compute_lines(self, source: str, lines: List[str], **kwargs) -> Any:
+        """
+        Calcula la métrica a partir del código fuente y de sus líneas (source.splitlines()).
+        """
+        pass
+
+
+class TokenMetricStrategy(MetricStrategy):
+    """
+    Estrategia que trabaja sobre los tokens del código fuente.
+    El tokenizer de Python puro es de lo más caro por fichero, así que la fachada
+    tokeniza una sola vez y comparte la lista entre las estrategias que la necesitan.
+    """
+    def compute(self, source: str) -> Any:
+        """
+        Tokeniza el código fuente y delega en compute_tokens.
+        """
+        return self.compute_tokens(source, tokenize_source(source) or [])
+
+    @abstractmethod
+    def compute_tokens(self, source: str, tokens: List[tokenize.TokenInfo]) -> Any:
+        """
+        Calcula la métrica a partir del código fuente y de su lista de tokens.
+        """
+        pass
+
+
+class ASTMetricStrategy(MetricStrategy):
+    """
+    Estrategia que trabaja sobre el AST ya parseado.
+    Permite que la fachada parsee cada fichero una sola vez y comparta el árbol
+    entre todas las estrategias basadas en AST.
+    """
+    def compute(self, source: str) -> Any:
+        """
+        Parsea el código fuente y delega en compute_ast.
+        """
+        return self.compute_ast(parse_source_cached(source))
+
+    @abstractmethod
+    def compute_ast(self, tree: Optional[ast.AST]) -> Any:
+        """
+        Calcula la métrica a partir del AST (None si el código no era parseable).
+        """
+        pass
@@ -1,34 +1,38 @@
 import ast
-from typing import Dict
-from .base import MetricStrategy
+from typing import Dict, Optional
+from .base import ASTMetricStrategy, FUNCTION_NODES, definition_nodes
 
-class ClassesStrategy(MetricStrategy):
+class ClassesStrategy(ASTMetricStrategy):
     """
     Estrategia para calcular métricas de Clases (Métodos públicos).
     Usa AST para identificar estructuras de clase, por lo que lo separamos de functions.py.
     """
     
     def compute(self, source: str) -> Dict[str, int]:
+        """
+        Recibe el código fuente (str); si no es Python válido devuelve {}.
+        """
+        if not isinstance(source, str):
+            raise TypeError("El código fuente debe ser un string")
+
+        return super().compute(source)
+
+    def compute_ast(self, tree: Optional[ast.AST]) -> Dict[str, int]:
         """
         Devuelve: { "NombreClase": numero_metodos_publicos }
+        Las clases anidadas usan su nombre cualificado ("Outer.Inner",
+        "factory.<locals>.Handler"), así dos clases con el mismo nombre no se pisan.
         """
         results = {}
-        try:
-            tree = ast.parse(source)
-        except SyntaxError:
+        if tree is None:
             return results
 
-        for node in ast.walk(tree):
+        for node in definition_nodes(tree):
             if isinstance(node, ast.ClassDef):
-                public_methods = 0
-                # Recorremos el cuerpo de la clase
-                for item in node.body:
-                    # Si es función y no empieza por _, es público
-                    if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
-                        # Contamos solo los que no empiezan por "_" (públicos)
-                        if not item.name.startswith("_"):
-                            public_methods += 1
-                
-                results[node.name] = public_methods
+                # Métodos directos del cuerpo de la clase que no empiezan por "_" (públicos)
+                results[node._qualname] = sum(
+                    1 for item in node.body
+                    if isinstance(item, FUNCTION_NODES) and not item.name.startswith("_")
+                )
         
         return results
\ No newline at end of file
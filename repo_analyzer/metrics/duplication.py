@@ -1,32 +1,49 @@
 from pathlib import Path
-from typing import Dict, Any, List, Tuple, Generator
-from collections import defaultdict
-import hashlib
+from typing import Dict, Any, List, Optional, Tuple, Generator
+from collections import Counter
 import re
-from .base import MetricStrategy
+from .base import FileMetricStrategy, LineMetricStrategy, read_source
 
-def normalize_to_lines(source, remove_comments=True, remove_def_class_header=True) -> List[str]:
+# NumPy y Numba son opcionales: con NumPy el conteo de shingles se vectoriza
+# y con Numba, además, se compila a código nativo
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = NUMPY_AVAILABLE
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Cabecera de función/clase (soporta 'async def'), precompilada una sola vez
+_DEF_CLASS_HEADER_RE = re.compile(r'(?:async\s+)?(?:def|class)\s')
+_DEF_CLASS_PREFIXES = ('def', 'class', 'async')
+
+def normalize_to_lines(source, remove_comments=True, remove_def_class_header=True,
+                       raw_lines: Optional[List[str]] = None) -> List[str]:
     """
-    Rompe el código en líneas. Colapsa todos los espacios en blanco.
+    Rompe el código en líneas y elimina los espacios en blanco al principio y al final de cada una.
         Elimina todas las lineas que comiencen en # (si remove_comments= True)
         Elimina todas las lineas que comiencen por def o class (si remove_def_class_header = True)
+    Si se recibe raw_lines (el resultado de source.splitlines()) no se vuelve a partir el código.
     """
-    lines = []
-    for line in source.splitlines():
-        clean_line = line
-        if remove_comments:
-            # Heurística simple: si hay un '#' fuera de comillas, es comentario
-            if '#' in clean_line and '"' not in clean_line and "'" not in clean_line:
-                clean_line = clean_line.split('#')[0]
-        
-        clean_line = clean_line.strip()
-        if remove_def_class_header:
-            # Soporte para 'async def'
-            clean_line = re.sub(r'^(async\s+)?(def|class)\s+.*', '', clean_line)        
-        
-        if clean_line: 
-            lines.append(clean_line)
-    return lines
+    if raw_lines is None:
+        raw_lines = source.splitlines()
+    # strip y splitlines se ejecutan en C; el resto son comprensiones sin llamadas a re.sub
+    lines = map(str.strip, raw_lines)
+    if remove_comments:
+        # Heurística simple: si hay un '#' fuera de comillas, es comentario
+        lines = [line.split('#', 1)[0].rstrip()
+                 if '#' in line and '"' not in line and "'" not in line else line
+                 for line in lines]
+    if remove_def_class_header:
+        # startswith filtra en C antes de recurrir a la regex
+        return [line for line in lines
+                if line and not (line.startswith(_DEF_CLASS_PREFIXES) and _DEF_CLASS_HEADER_RE.match(line))]
+    return [line for line in lines if line]
 
 def create_shingles(lines, window) -> Generator[Tuple[int, List[str]], Any, Any]:
     """
@@ -36,12 +53,107 @@ def create_shingles(lines, window) -> Generator[Tuple[int, List[str]], Any, Any]
     for i in range(len(lines) - window + 1):
         yield (i + 1, lines[i:i + window])
 
+# Parámetros del hash rodante (Rabin-Karp): base y primo de Mersenne 2^61 - 1
+RK_BASE = 60013
+RK_MOD = (1 << 61) - 1
+
+def rolling_shingle_hashes(lines, window) -> List[int]:
+    """
+    Calcula el hash de cada shingle de tamaño 'window' con un hash rodante (Rabin-Karp).
+    Cada línea se hashea una sola vez y la ventana se desplaza en O(1) por paso,
+    en lugar de concatenar y hashear 'window' líneas por shingle.
+    """
+    if window <= 0 or len(lines) < window:
+        return []
+
+    line_hashes = [hash(line) % RK_MOD for line in lines]
+    top_power = pow(RK_BASE, window, RK_MOD)
+
+    h = 0
+    for lh in line_hashes[:window]:
+        h = (h * RK_BASE + lh) % RK_MOD
+
+    hashes = [h]
+    for i in range(window, len(line_hashes)):
+        h = (h * RK_BASE - line_hashes[i - window] * top_power + line_hashes[i]) % RK_MOD
+        hashes.append(h)
+    return hashes
+
+if NUMPY_AVAILABLE:
+    def _roll_and_count_impl(line_hashes, window):
+        """
+        Hash rodante en uint64 (módulo 2^64) que cuenta los duplicados ordenando los
+        hashes en lugar de usar un diccionario. Devuelve (shingles_duplicados, shingles_totales).
+        El desbordamiento es intencionado: compilado con Numba da la vuelta en silencio,
+        pero sin JIT (NUMBA_DISABLE_JIT) opera con escalares de NumPy, que avisan de cada
+        desbordamiento, así que hay que llamarla dentro de np.errstate(over="ignore").
+        """
+        n = line_hashes.shape[0]
+        total = n - window + 1
+        base = np.uint64(RK_BASE)
+        top_power = np.uint64(1)
+        for _ in range(window):
+            top_power *= base
+
+        shingle_hashes = np.empty(total, dtype=np.uint64)
+        h = np.uint64(0)
+        for i in range(window):
+            h = h * base + line_hashes[i]
+        shingle_hashes[0] = h
+        for i in range(window, n):
+            h = h * base - line_hashes[i - window] * top_power + line_hashes[i]
+            shingle_hashes[i - window + 1] = h
+
+        shingle_hashes.sort()
+        duplicated = 0
+        run = 1
+        for i in range(1, total):
+            if shingle_hashes[i] == shingle_hashes[i - 1]:
+                run += 1
+            else:
+                if run > 1:
+                    duplicated += run
+                run = 1
+        if run > 1:
+            duplicated += run
+        return duplicated, total
+
+if NUMBA_AVAILABLE:
+    _roll_and_count = njit(cache=True)(_roll_and_count_impl)
+
+def count_duplicated_shingles(lines, window) -> Tuple[int, int]:
+    """
+    Devuelve (shingles_duplicados, shingles_totales) para las líneas normalizadas.
+    Usa la versión compilada con Numba si está disponible y, si no, NumPy o Counter.
+    """
+    if window <= 0 or len(lines) < window:
+        return 0, 0
+
+    if NUMBA_AVAILABLE:
+        line_hashes = np.fromiter((hash(line) & 0xFFFFFFFFFFFFFFFF for line in lines),
+                                  dtype=np.uint64, count=len(lines))
+        # La vuelta módulo 2^64 es parte del hash: se silencia explícitamente para que el
+        # camino sin compilar (NUMBA_DISABLE_JIT) no llene la salida de RuntimeWarning
+        with np.errstate(over="ignore"):
+            duplicated, total = _roll_and_count(line_hashes, window)
+        return int(duplicated), int(total)
+
+    if NUMPY_AVAILABLE:
+        # np.unique ordena en C y cuenta sin construir un diccionario en Python
+        hashes = np.array(rolling_shingle_hashes(lines, window), dtype=np.int64)
+        _, freqs = np.unique(hashes, return_counts=True)
+        return int(freqs[freqs > 1].sum()), int(hashes.size)
+
+    counts = Counter(rolling_shingle_hashes(lines, window))
+    duplicated = sum(freq for freq in counts.values() if freq > 1)
+    return duplicated, sum(counts.values())
+
 def compute_duplication(path, window):
     """
     Carga el código fuente desde el fichero que está en filepath.
     Normaliza su código usando normalize_to_lines.
     Genera conjuntos de items contiguos de tamaño window, usando create_shingles.
-    Para cada shingle, obtiene su hash y lo almacena
+    Para cada shingle, obtiene su hash (rodante) y lo almacena
     """
     p = Path(path)
     # Manejo de archivos inexistentes
@@ -50,20 +162,27 @@ def compute_duplication(path, window):
         
     try:
         # errors='ignore' para archivos binarios o Latin-1
-        source = p.read_text(encoding='utf-8', errors='ignore')
-        from collections import Counter
-        lines = normalize_to_lines(source)
+        source = read_source(p)
+    except OSError:
+        return 0.0
+    return duplication_from_source(source, window)
+
+def duplication_from_source(source, window, raw_lines: Optional[List[str]] = None) -> float:
+    """
+    Calcula el ratio de duplicación a partir del código fuente ya cargado
+    (y opcionalmente de sus líneas ya separadas).
+    """
+    try:
+        lines = normalize_to_lines(source, raw_lines=raw_lines)
         if len(lines) < window: return 0.0
-        shingle_hashes = [hashlib.md5("".join(s).encode()).hexdigest() for _, s in create_shingles(lines, window)]
-        counts = Counter(shingle_hashes)
-        duplicated = sum(freq for freq in counts.values() if freq > 1)
+        duplicated, total = count_duplicated_shingles(lines, window)
         
-        return duplicated / len(shingle_hashes)
+        return duplicated / total if total else 0.0
                                 
     except Exception:
         return 0.0
 
-class DuplicationStrategy(MetricStrategy):
+class DuplicationStrategy(FileMetricStrategy, LineMetricStrategy):
     """
     Calcula el ratio de duplicación por fichero usando la heurística de shingles.
     """
@@ -72,4 +191,16 @@ class DuplicationStrategy(MetricStrategy):
         Recibe la ruta del archivo y la ventana (window) para calcular el ratio de duplicación.
         """
         # Delegar el trabajo de cálculo a la función reutilizada
-        return compute_duplication(filepath, window)
\ No newline at end of file
+        return compute_duplication(filepath, window)
+
+    def compute_from_source(self, source: str, window: int=4) -> float:
+        """
+        Recibe el código fuente ya cargado y la ventana para calcular el ratio de duplicación.
+        """
+        return duplication_from_source(source, window)
+
+    def compute_lines(self, source: str, lines: List[str], window: int=4) -> float:
+        """
+        Igual que compute_from_source, reutilizando las líneas ya separadas por la fachada.
+        """
+        return duplication_from_source(source, window, lines)
\ No newline at end of file
@@ -1,7 +1,17 @@
+import atexit
+import logging
+import multiprocessing
+import os
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
 from pathlib import Path
-from typing import Dict, Any, List, Set
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Set, Tuple
 
-from .base import MetricStrategy
+from .base import (MetricStrategy, ASTMetricStrategy, FileMetricStrategy, LineMetricStrategy,
+                   TokenMetricStrategy, parse_source, read_source, tokenize_source)
 from .lines import LinesStrategy
 from .imports import NumImportsStrategy
 from .functions import FunctionsStrategy
@@ -9,49 +19,234 @@ from .duplication import DuplicationStrategy
 from .maintainability import MaintainabilityStrategy
 from .todos import TodosStrategy
 from .classes import ClassesStrategy
+from .parse_cache import MetricCache, metric_cache_key
+
+log = logging.getLogger(__name__)
+
+IGNORED_DIRS: frozenset = frozenset({
+    '.git', '__pycache__', 'venv', '.venv', 'env', 
+    'tests', 'test', 'fixtures', 'migrations', 
+    'docs', 'build', 'dist', 'egg-info'
+})
+
+def _walk_py(root: str, ignored: frozenset = IGNORED_DIRS) -> Iterator[str]:
+    """
+    Recorre el árbol con os.scandir y devuelve las rutas (str) de los ficheros .py.
+    Las carpetas ignoradas se descartan al nivel de directorio, sin llegar a entrar en ellas.
+    """
+    pending = [root]
+    while pending:
+        try:
+            with os.scandir(pending.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in ignored:
+                            pending.append(entry.path)
+                    elif entry.name.endswith('.py') and entry.is_file():
+                        yield entry.path
+        except OSError:
+            # Directorio sin permisos o eliminado durante el recorrido
+            continue
 
 def list_py_files(root: Path) -> List[Path]:
-    """Lista recursivamente archivos .py ignorando carpetas comunes."""
-    IGNORED_DIRS = {
-        '.git', '__pycache__', 'venv', '.venv', 'env', 
-        'tests', 'test', 'fixtures', 'migrations', 
-        'docs', 'build', 'dist', 'egg-info'
-    }
-    result = []
-    
-    print(f"[DEBUG FACADE] Iniciando búsqueda de archivos en: {root.absolute()}")
-    
+    """
+    Lista recursivamente archivos .py ignorando carpetas comunes.
+    Se recorre el árbol en cada llamada: comprobar si ha cambiado costaría lo mismo
+    que el propio recorrido con os.scandir (y la lista solo se pide una vez por análisis).
+    """
+    root = Path(root)
     if not root.exists():
-        print(f"[DEBUG FACADE] ❌ Error Crítico: La ruta {root} no existe.")
+        log.error("Error Crítico: La ruta %s no existe.", root)
         return []
 
-    all_py_files = list(root.rglob('*.py'))
-    print(f"[DEBUG FACADE] Archivos .py detectados (bruto): {len(all_py_files)}")
+    log.debug("Iniciando búsqueda de archivos en: %s", root)
+    result = [Path(p) for p in _walk_py(str(root))]
+    log.debug("Archivos válidos para análisis: %d", len(result))
+    return result
+
+
+def _compute_with_tree(strategy: MetricStrategy, source_code: str, tree: Optional[Any]) -> Any:
+    """Usa el AST compartido si la estrategia lo admite; si no, le pasa el código fuente."""
+    if isinstance(strategy, ASTMetricStrategy):
+        return strategy.compute_ast(tree)
+    return strategy.compute(source_code)
+
+def _compute_with_lines(strategy: MetricStrategy, source_code: str, lines: List[str], **kwargs) -> Any:
+    """Reutiliza las líneas ya separadas si la estrategia lo admite; si no, le pasa el código fuente."""
+    if isinstance(strategy, LineMetricStrategy):
+        return strategy.compute_lines(source_code, lines, **kwargs)
+    return strategy.compute(source_code)
+
+def _compute_with_tokens(strategy: MetricStrategy, source_code: str,
+                         tokens: Optional[List[Any]]) -> Any:
+    """Reutiliza los tokens ya generados si los hay y la estrategia lo admite; si no, le pasa el código fuente."""
+    if tokens is not None and isinstance(strategy, TokenMetricStrategy):
+        return strategy.compute_tokens(source_code, tokens)
+    return strategy.compute(source_code)
+
+def _compute_duplication(strategy: MetricStrategy, filepath: Path, source_code: str,
+                         lines: List[str], window: int) -> Any:
+    """La duplicación admite las líneas ya separadas, el fuente ya leído o, en último caso, la ruta."""
+    if isinstance(strategy, LineMetricStrategy):
+        return strategy.compute_lines(source_code, lines, window=window)
+    return _compute_with_source(strategy, filepath, source_code, window=window)
+
+def _compute_with_source(strategy: MetricStrategy, filepath: Path, source_code: str, **kwargs) -> Any:
+    """Reutiliza el fuente ya leído si la estrategia lo admite; si no, le pasa la ruta."""
+    if isinstance(strategy, FileMetricStrategy):
+        return strategy.compute_from_source(source_code, **kwargs)
+    return strategy.compute(filepath, **kwargs)
+
+# Por debajo de estos bytes de código pendiente no compensa repartir entre procesos.
+# Medido: el análisis secuencial va a ~1.3 MB/s, arrancar el pool (forkserver con la
+# fachada precargada) cuesta ~0.16 s una vez por proceso y, ya arrancado, cada fichero
+# enviado añade ~0.4 ms de IPC. 512 KiB son ~0.4 s de trabajo: con 2 procesos ya cubren
+# el arranque y, con el pool caliente, el reparto gana con holgura
+PARALLEL_MIN_BYTES = 512 * 1024
+
+def _analyze_file(strategies: Dict[str, MetricStrategy], filepath: Path,
+                  repo_path: Path, dup_window: int) -> Optional[tuple]:
+    """
+    Aplica todas las estrategias a un único fichero.
+    Es una función de módulo para poder enviarla a los procesos del pool.
+    Devuelve (file_data, total_cc, num_funcs, mi, duplicacion, todos, lineas) o None si falla.
+    """
+    try:
+        source_code = read_source(filepath, errors="replace")
+        # Un único parseo por fichero, compartido por las estrategias basadas en AST
+        tree = parse_source(source_code)
+        # Y un único splitlines, compartido por las estrategias basadas en líneas
+        lines = source_code.splitlines()
+        # Los tokens solo hacen falta si el código es válido (MI devuelve 0.0 sin AST);
+        # se generan una vez para MI (Halstead) y TODOs
+        tokens = tokenize_source(source_code) if tree is not None else None
+
+        n_lines = _compute_with_lines(strategies["lines"], source_code, lines)
+        # Los imports se cuentan sobre el AST compartido (por líneas si no es parseable)
+        n_imports = _compute_with_lines(strategies["imports"], source_code, lines, tree=tree)
+        n_todos = _compute_with_tokens(strategies["todos"], source_code, tokens)
+        func_metrics = _compute_with_tree(strategies["functions"], source_code, tree)
+        class_metrics = _compute_with_tree(strategies["classes"], source_code, tree)
+        # Fichero leído una sola vez: MI y duplicación reciben el fuente, no la ruta
+        mi_score = _compute_with_source(strategies["maintainability"], filepath, source_code,
+                                        tree=tree, tokens=tokens)
+        # Con menos líneas físicas que la ventana no puede haber ningún shingle
+        if n_lines < dup_window:
+            dup_ratio = 0.0
+        else:
+            dup_ratio = _compute_duplication(strategies["duplication"], filepath, source_code, lines, dup_window)
+
+        file_total_cc = sum(f.get("cc", 0) for f in func_metrics.values())
+        file_num_funcs = len(func_metrics)
+        file_avg_cc = (file_total_cc / file_num_funcs) if file_num_funcs > 0 else 0.0
+
+        file_data = {
+            "path": str(filepath.relative_to(repo_path)),
+            "total_lines": n_lines, "num_imports": n_imports, "todos": n_todos,
+            "duplication_ratio": dup_ratio, "maintainability_index": mi_score,
+            "avg_cc": file_avg_cc, "functions": func_metrics, "public_methods": class_metrics
+        }
+        return file_data, file_total_cc, file_num_funcs, mi_score, dup_ratio, n_todos, n_lines
+
+    except Exception as e:
+        log.warning("Excepción controlada analizando %s: %s", filepath.name, e)
+        return None
+
+
+# Estrategias del proceso hijo, fijadas por el initializer del pool
+_worker_strategies: Optional[Dict[str, MetricStrategy]] = None
+
+# Los hijos del pool no se crean con fork: la fachada corre dentro del proceso de Flask,
+# que ya tiene otros hilos (escritor de la BD, uno por petición), y un fork copiaría
+# sus locks tal como estén, pudiendo dejar al hijo bloqueado. Las estrategias llegan
+# al hijo por el initializer, así que no hace falta heredar la memoria del padre
+POOL_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+def _init_worker(strategies: Dict[str, MetricStrategy]) -> None:
+    global _worker_strategies
+    _worker_strategies = strategies
+
+def _analyze_in_worker(filepath: Path, repo_path: Path, dup_window: int) -> Optional[tuple]:
+    return _analyze_file(_worker_strategies, filepath, repo_path, dup_window)
 
-    for path in all_py_files:
+# Un único pool por proceso, creado la primera vez que compensa y reutilizado después:
+# cada pool nuevo vuelve a arrancar procesos e importar los módulos de métricas
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_key: Optional[tuple] = None
+_pool_lock = threading.Lock()
+
+def _get_pool(workers: int, strategies: Dict[str, MetricStrategy]) -> ProcessPoolExecutor:
+    """
+    Devuelve el pool del proceso. Solo se recrea si cambia el número de procesos
+    o las clases de las estrategias que recibieron los hijos en el initializer.
+    """
+    global _pool, _pool_key
+    key = (workers, tuple(type(s) for s in strategies.values()))
+    with _pool_lock:
+        if _pool is None or _pool_key != key:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            context = multiprocessing.get_context(POOL_START_METHOD)
+            if POOL_START_METHOD == "forkserver":
+                # El servidor importa la fachada una vez; los hijos nacen ya con ella cargada
+                context.set_forkserver_preload([__name__])
+            _pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                        initargs=(strategies,), mp_context=context)
+            _pool_key = key
+        return _pool
+
+def shutdown_pool() -> None:
+    """Cierra el pool del proceso (si existe). El siguiente análisis paralelo crea otro."""
+    global _pool, _pool_key
+    with _pool_lock:
+        pool, _pool, _pool_key = _pool, None, None
+    if pool is not None:
+        pool.shutdown()
+
+atexit.register(shutdown_pool)
+
+def _total_bytes(py_files: List[Path]) -> int:
+    """Tamaño total de los ficheros (los que no se pueden leer cuentan 0)."""
+    total = 0
+    for path in py_files:
         try:
-            rel_path = path.relative_to(root)
-            parts = set(rel_path.parts)
-            if not parts.intersection(IGNORED_DIRS):
-                result.append(path)
-        except ValueError:
-            result.append(path)
-            
-    print(f"[DEBUG FACADE] ✅ Archivos válidos para análisis: {len(result)}")
-    return result
+            total += os.path.getsize(path)
+        except OSError:
+            pass
+    return total
+
+
+# Instancias de estrategias compartidas por todo el proceso: (clases, instancias)
+_shared_strategies: Optional[Tuple[tuple, Dict[str, MetricStrategy]]] = None
+
+def shared_strategies() -> Dict[str, MetricStrategy]:
+    """
+    Devuelve las instancias de estrategias compartidas por el proceso.
+    Las estrategias NO deben guardar estado entre llamadas, ya que se reutilizan
+    en todas las fachadas. Si cambian las clases (p. ej. al parchearlas), se recrean.
+    """
+    global _shared_strategies
+    classes = (
+        ("lines", LinesStrategy),
+        ("imports", NumImportsStrategy),
+        ("functions", FunctionsStrategy),
+        ("duplication", DuplicationStrategy),
+        ("maintainability", MaintainabilityStrategy),
+        ("todos", TodosStrategy),
+        ("classes", ClassesStrategy),
+    )
+    key = tuple(cls for _, cls in classes)
+    if _shared_strategies is None or _shared_strategies[0] != key:
+        _shared_strategies = (key, {name: cls() for name, cls in classes})
+    return _shared_strategies[1]
 
 
 class MetricsFacade:
-    def __init__(self):
-        self.strategies: Dict[str, MetricStrategy] = {
-            "lines": LinesStrategy(),
-            "imports": NumImportsStrategy(),
-            "functions": FunctionsStrategy(),
-            "duplication": DuplicationStrategy(),
-            "maintainability": MaintainabilityStrategy(),
-            "todos": TodosStrategy(),
-            "classes": ClassesStrategy(),
-        }
+    def __init__(self, cache: Optional[MetricCache] = None):
+        # Copia superficial: se comparten las instancias, no el diccionario
+        self.strategies: Dict[str, MetricStrategy] = dict(shared_strategies())
+        # Caché opcional de métricas por contenido de fichero (entre ejecuciones)
+        self.cache = cache
 
     def compute_all(self, repo_path: Path, options: dict) -> Dict[str, Any]:
         repo_path = Path(repo_path)
@@ -72,7 +267,7 @@ class MetricsFacade:
         results["summary"]["num_files"] = len(py_files)
 
         if not py_files:
-            print("[DEBUG FACADE] ⚠️ Alerta: Repositorio vacío.")
+            log.warning("Alerta: Repositorio vacío.")
             return results
 
         total_cc_sum = 0.0
@@ -80,42 +275,20 @@ class MetricsFacade:
         total_mi_sum = 0.0
         total_duplication_sum = 0.0
 
-        for filepath in py_files:
-            try:
-                source_code = filepath.read_text(encoding="utf-8", errors="replace")
-                
-                n_lines = self.strategies["lines"].compute(source_code)
-                n_imports = self.strategies["imports"].compute(source_code)
-                n_todos = self.strategies["todos"].compute(source_code)
-                func_metrics = self.strategies["functions"].compute(source_code)
-                class_metrics = self.strategies["classes"].compute(source_code)
-                mi_score = self.strategies["maintainability"].compute(filepath)
-                dup_ratio = self.strategies["duplication"].compute(filepath, window=dup_window)
-
-                file_total_cc = sum(f.get("cc", 0) for f in func_metrics.values())
-                file_num_funcs = len(func_metrics)
-                file_avg_cc = (file_total_cc / file_num_funcs) if file_num_funcs > 0 else 0.0
-
-                file_data = {
-                    "path": str(filepath.relative_to(repo_path)),
-                    "total_lines": n_lines, "num_imports": n_imports, "todos": n_todos,
-                    "duplication_ratio": dup_ratio, "maintainability_index": mi_score,
-                    "avg_cc": file_avg_cc, "functions": func_metrics, "public_methods": class_metrics
-                }
-                
-                results["files"].append(file_data)
-                results["summary"]["total_lines"] += n_lines
-                results["summary"]["todos"] += n_todos
-                results["summary"]["summary_funcs"] += file_num_funcs
-                
-                total_mi_sum += mi_score
-                total_duplication_sum += dup_ratio
-                total_cc_sum += file_total_cc
-                total_functions_count += file_num_funcs
-
-            except Exception as e:
-                print(f"[DEBUG FACADE] Excepción controlada analizando {filepath.name}: {e}")
+        for analyzed in self._analyze_files(py_files, repo_path, dup_window, options):
+            if analyzed is None:
                 continue
+            file_data, file_total_cc, file_num_funcs, mi_score, dup_ratio, n_todos, n_lines = analyzed
+
+            results["files"].append(file_data)
+            results["summary"]["total_lines"] += n_lines
+            results["summary"]["todos"] += n_todos
+            results["summary"]["summary_funcs"] += file_num_funcs
+
+            total_mi_sum += mi_score
+            total_duplication_sum += dup_ratio
+            total_cc_sum += file_total_cc
+            total_functions_count += file_num_funcs
 
         num_analyzed = len(results["files"])
         if num_analyzed > 0:
@@ -126,3 +299,70 @@ class MetricsFacade:
             results["summary"]["avg_cc"] = total_cc_sum / total_functions_count
 
         return results
+
+    def _analyze_files(self, py_files: List[Path], repo_path: Path, dup_window: int, options: dict) -> Iterable[Optional[tuple]]:
+        """
+        Devuelve el análisis de cada fichero (en el orden de py_files), reutilizando
+        la caché por contenido cuando existe. Con force=True se recalcula todo
+        (y se refresca la caché).
+        """
+        if self.cache is None:
+            return self._compute_files(py_files, repo_path, dup_window, options)
+
+        try:
+            # Con force se vuelve a leer todo: no se confía en el atajo por mtime/tamaño
+            if options.get("force"):
+                keys = [metric_cache_key(path, dup_window) for path in py_files]
+                cached = {}
+            else:
+                keys = self.cache.keys_for(py_files, dup_window)
+                cached = self.cache.get_many(keys)
+        except sqlite3.Error as e:
+            log.warning("Caché de métricas no disponible: %s", e)
+            keys = [metric_cache_key(path, dup_window) for path in py_files]
+            cached = {}
+
+        pending = [i for i, key in enumerate(keys) if key not in cached]
+        computed = self._compute_files([py_files[i] for i in pending], repo_path, dup_window, options)
+
+        analyzed: List[Optional[tuple]] = [None] * len(py_files)
+        for i, key in enumerate(keys):
+            if key in cached:
+                # El contenido es el mismo, pero la ruta puede haber cambiado
+                file_data, *rest = cached[key]
+                file_data = dict(file_data, path=str(py_files[i].relative_to(repo_path)))
+                analyzed[i] = (file_data, *rest)
+
+        new_entries = {}
+        for i, result in zip(pending, computed):
+            analyzed[i] = result
+            if result is not None and keys[i] is not None:
+                new_entries[keys[i]] = result
+        try:
+            self.cache.put_many(new_entries)
+        except sqlite3.Error as e:
+            log.warning("No se pudo actualizar la caché de métricas: %s", e)
+
+        return analyzed
+
+    def _compute_files(self, py_files: List[Path], repo_path: Path, dup_window: int, options: dict) -> Iterable[Optional[tuple]]:
+        """
+        Reparte el análisis de los ficheros entre varios procesos cuando compensa.
+        Los resultados se devuelven en el mismo orden que py_files.
+        """
+        workers = options.get("workers") or os.cpu_count() or 1
+        sequential = partial(_analyze_file, self.strategies, repo_path=repo_path, dup_window=dup_window)
+        if workers <= 1 or len(py_files) < 2 or _total_bytes(py_files) < PARALLEL_MIN_BYTES:
+            return map(sequential, py_files)
+
+        # Las estrategias viajan una sola vez a cada proceso (initializer),
+        # no con cada lote de ficheros
+        analyze = partial(_analyze_in_worker, repo_path=repo_path, dup_window=dup_window)
+        chunksize = max(1, len(py_files) // (4 * workers))
+        try:
+            return list(_get_pool(workers, self.strategies).map(analyze, py_files, chunksize=chunksize))
+        except BrokenProcessPool as e:
+            # Un hijo murió (p. ej. por memoria): se descarta el pool y se sigue en este proceso
+            log.warning("Pool de análisis roto, se continúa en secuencial: %s", e)
+            shutdown_pool()
+            return list(map(sequential, py_files))
@@ -1,6 +1,6 @@
 import ast
-from typing import Dict, Any, List
-from .base import MetricStrategy
+from typing import Dict, Any, List, Optional, Tuple
+from .base import ASTMetricStrategy, FUNCTION_NODES, definition_nodes
 
 def lines_per_function(fn_node: ast.FunctionDef) -> int:
     """
@@ -19,69 +19,85 @@ def num_params(fn_node: ast.FunctionDef, count_first: bool = True) -> int:
 
     return n_params
 
-def cyclomatic_per_function(fn_node: ast.FunctionDef) -> int:
+# Nodos que suman un punto de decisión y nodos que abren un nivel de anidamiento.
+# Se comparan por type() contra un frozenset, más barato que isinstance con una tupla.
+# Cada rama case de un match (Python 3.10+) cuenta como un punto de decisión
+_DECISION_NODES = frozenset({ast.If, ast.For, ast.While, ast.AsyncFor, ast.ExceptHandler, ast.IfExp,
+                             ast.comprehension, ast.match_case})
+_NESTING_NODES = frozenset({ast.If, ast.For, ast.While, ast.Try, ast.With, ast.AsyncWith})
+
+def cc_and_nesting(fn_node: ast.FunctionDef) -> Tuple[int, int]:
     """
-    Añade un punto de complejidad ciclomática por cada decision point. Los decision points son nodos que introducen caminos alternativos.
+    Calcula en un único recorrido del subárbol la complejidad ciclomática y la máxima
+    profundidad de anidamiento de la función. Ambos valores se guardan en el nodo para
+    que MaintainabilityStrategy no repita el cálculo.
     """
+    cached = getattr(fn_node, "_cc_nesting", None)
+    if cached is not None:
+        return cached
+
     decision_points = 0
-    
-    def visit(node):
-        nonlocal decision_points
-        if isinstance(node, (ast.If, ast.For, ast.While, ast.AsyncFor,
-                             ast.ExceptHandler, ast.IfExp)):  # Puntos de decisión simples
-            decision_points += 1
-        elif isinstance(node, ast.comprehension):  # Comprehensions
+    max_depth = 0
+    # Recorrido iterativo con una pila explícita de (nodo, profundidad). Los hijos se
+    # sacan de _fields directamente, igual que ast.iter_child_nodes pero sin crear un
+    # generador por nodo ni una llamada recursiva por cada nodo del subárbol
+    stack = [(fn_node, 0)]
+    pop, push = stack.pop, stack.append
+    while stack:
+        node, current_depth = pop()
+        node_type = type(node)
+        if node_type in _DECISION_NODES:  # Puntos de decisión simples y comprehensions
             decision_points += 1
-        elif isinstance(node, ast.BoolOp):  # Operadores booleanos
+        elif node_type is ast.BoolOp:  # Operadores booleanos
             decision_points += len(node.values) - 1
-        elif isinstance(node, ast.Compare):  # Comparaciones encadenadas
+        elif node_type is ast.Compare:  # Comparaciones encadenadas
             decision_points += max(len(node.ops) - 1, 0)
-        
-        for child in ast.iter_child_nodes(node):
-            visit(child)
 
-    visit(fn_node)
-    return 1 + decision_points
+        if node_type in _NESTING_NODES:
+            current_depth += 1
+            if current_depth > max_depth:
+                max_depth = current_depth
+
+        for field in node._fields:
+            value = getattr(node, field, None)
+            if isinstance(value, ast.AST):
+                push((value, current_depth))
+            elif isinstance(value, list):
+                for child in value:
+                    if isinstance(child, ast.AST):
+                        push((child, current_depth))
+
+    fn_node._cc_nesting = (1 + decision_points, max_depth)
+    return fn_node._cc_nesting
+
+def cyclomatic_per_function(fn_node: ast.FunctionDef) -> int:
+    """
+    Añade un punto de complejidad ciclomática por cada decision point. Los decision points son nodos que introducen caminos alternativos.
+    """
+    return cc_and_nesting(fn_node)[0]
 
 def max_nesting(fn_node: ast.FunctionDef) -> int:
     """
     Devuelve la máxima profundidad de anidamiento de estructuras de control dentro de la función (cuántos niveles de if/for/while/try/with anidados hay).
     """
-    max_depth = 0
-    
-    def visit(node, current_depth=0):
-        nonlocal max_depth
-        if isinstance(node, (ast.If, ast.For, ast.While, ast.Try,
-                             ast.With, ast.AsyncWith)):
-            current_depth += 1
-            max_depth = max(max_depth, current_depth)
-            for child in ast.iter_child_nodes(node):
-                visit(child, current_depth)
-            return
-        for child in ast.iter_child_nodes(node):
-            visit(child, current_depth)
-
-    visit(fn_node)
-    return max_depth
+    return cc_and_nesting(fn_node)[1]
 
 
-class FunctionsStrategy(MetricStrategy):
+class FunctionsStrategy(ASTMetricStrategy):
     """
     Reúne métricas por función (LOC, parámetros, CC, anidamiento) usando el AST.
     """
-    def compute(self, source: str) -> Dict[str, Any]:
+    def compute_ast(self, tree: Optional[ast.AST]) -> Dict[str, Any]:
         """
-        Analiza el código y devuelve un diccionario con métricas por función/método.
+        Analiza el AST y devuelve un diccionario con métricas por función/método.
         """
         results: Dict[str, Any] = {}
 
-        try:
-            tree = ast.parse(source)
-        except SyntaxError:
+        if tree is None:
             return results
 
-        for node in ast.walk(tree):
-            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        for node in definition_nodes(tree):
+            if isinstance(node, FUNCTION_NODES):
                 
                 is_method = isinstance(node.parent, ast.ClassDef) if hasattr(node, 'parent') else False
                 
@@ -98,8 +114,7 @@ class FunctionsStrategy(MetricStrategy):
                 # Calcular todas las métricas
                 params = num_params(node, count_first=count_self)
                 loc = lines_per_function(node)
-                cc = cyclomatic_per_function(node)
-                nesting = max_nesting(node)
+                cc, nesting = cc_and_nesting(node)
 
                 results[func_name] = {
                     "loc": loc,
@@ -1,16 +1,30 @@
-from .base import MetricStrategy
+import ast
+from typing import List, Optional
+from .base import LineMetricStrategy, num_import_nodes, parse_source_cached
 
-class NumImportsStrategy(MetricStrategy):
+# Prefijos que identifican una declaración de import en una línea ya sin espacios
+_IMPORT_PREFIXES = ("import ", "from ")
+
+class NumImportsStrategy(LineMetricStrategy):
     """
-    Estrategia concreta para contar el número de declaraciones de import
+    Estrategia concreta para contar el número de declaraciones de import.
+    Con AST cuenta los nodos Import/ImportFrom (no confunde texto dentro de strings
+    o docstrings); si el código no es Python válido cuenta las líneas que empiezan por import.
     """
     def compute(self, source: str) -> int:
         """
         Recibe el código fuente (str) y devuelve el conteo de imports.
         """
-        count = 0
-        for line in source.splitlines():
-            stripped = line.strip()
-            if stripped.startswith("import ") or stripped.startswith("from "):
-                count += 1
-        return count
\ No newline at end of file
+        return self.compute_lines(source, source.splitlines(), tree=parse_source_cached(source))
+
+    def compute_lines(self, source: str, lines: List[str], tree: Optional[ast.AST] = None) -> int:
+        """
+        Recibe el código fuente (str), sus líneas y su AST (la fachada los comparte)
+        y devuelve el conteo de imports. Sin AST (código no parseable) se cuenta por líneas.
+        """
+        if tree is not None:
+            # Contados en la pasada compartida con funciones y clases
+            return num_import_nodes(tree)
+        # map(str.strip) y un único startswith con tupla ahorran trabajo por línea
+        return sum(1 for stripped in map(str.strip, lines)
+                   if stripped.startswith(_IMPORT_PREFIXES))
\ No newline at end of file
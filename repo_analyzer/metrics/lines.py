@@ -1,6 +1,10 @@
-from .base import MetricStrategy
+from typing import List
+from .base import LineMetricStrategy
 
-class LinesStrategy(MetricStrategy):
+# Saltos de línea ASCII que splitlines reconoce además de '\n'
+_OTHER_ASCII_BREAKS = ('\r', '\x0b', '\x0c', '\x1c', '\x1d', '\x1e')
+
+class LinesStrategy(LineMetricStrategy):
     """
     Estrategia concreta para calcular el número de líneas por fichero (LOC).
     """
@@ -13,8 +17,19 @@ class LinesStrategy(MetricStrategy):
 
         if not isinstance(source, str):
             raise TypeError("El código fuente debe ser un string")
-        
-        lines = source.splitlines()
+
+        if not source.strip():
+            return 0
+        # Camino rápido: si '\n' es el único salto posible, contar en C (memchr) da lo
+        # mismo que len(splitlines()) sin crear una cadena por línea
+        if source.isascii() and not any(brk in source for brk in _OTHER_ASCII_BREAKS):
+            return source.count("\n") + (not source.endswith("\n"))
+        return super().compute(source)
+
+    def compute_lines(self, source: str, lines: List[str]) -> int:
+        """
+        Devuelve el número de líneas a partir de las líneas ya separadas.
+        """
         # Si el archivo es solo un '\n', splitlines da [''], pero el test espera 0
         if source == "\n" or not source.strip():
             return 0
@@ -1,81 +1,93 @@
 import ast, io, tokenize, keyword, math
 from pathlib import Path
-from collections import defaultdict
-from .base import MetricStrategy
+from typing import List, Optional, Tuple
+from .base import FileMetricStrategy, definition_nodes, parse_source, read_source
+# Misma definición de CC que FunctionsStrategy (y comparte su caché por nodo)
+from .functions import cyclomatic_per_function
 
-def cyclomatic_per_function(fn_node: ast.FunctionDef) -> int:
+def compute_maintainability_index(filepath):
     """
-    Añade un punto de complejidad ciclomática por cada decision point. Los decision points son nodos que introducen caminos alternativos.
+    Carga el código fuente desde el fichero que está en filepath y calcula su MI.
     """
-    decision_points = 0
-    
-    def visit(node):
-        nonlocal decision_points
-        if isinstance(node, (ast.If, ast.For, ast.While, ast.AsyncFor,
-                             ast.ExceptHandler, ast.IfExp)):  # Puntos de decisión simples
-            decision_points += 1
-        elif isinstance(node, ast.comprehension):  # Comprehensions
-            decision_points += 1
-        elif isinstance(node, ast.BoolOp):  # Operadores booleanos
-            decision_points += len(node.values) - 1
-        elif isinstance(node, ast.Compare):  # Comparaciones encadenadas
-            decision_points += max(len(node.ops) - 1, 0)
-        
-        for child in ast.iter_child_nodes(node):
-            visit(child)
-
-    visit(fn_node)
-    return 1 + decision_points
+    source = read_source(filepath)
+    return maintainability_index_from_source(source)
 
-def compute_maintainability_index(filepath):
+def maintainability_index_from_source(source: str, tree: Optional[ast.AST] = None,
+                                      tokens: Optional[List[tokenize.TokenInfo]] = None) -> float:
     """
-    Carga el código fuente desde el fichero que está en filepath.
     Obtiene LOC y CC usando funciones de sesiones anteriores.
     Obtiene el volumen
     Aplica la formula
+    Si se recibe el AST ya parseado (la fachada lo comparte), no se vuelve a parsear,
+    y si se reciben los tokens tampoco se vuelve a tokenizar.
     """
-
-    source = Path(filepath).read_text(encoding="utf-8", errors='ignore')
-    try:
-        tree = ast.parse(source)
-    except SyntaxError:
+    if tree is None:
+        tree = parse_source(source)
+    if tree is None:
         return 0.0 
 
     # 1. LOC y CC
+    loc, cc_total = functions_loc_and_cc(tree)
+
+    # 2. Halstead
+    volume = halstead_volume(source, tokens)
+
+    # 3. Fórmula MI
+    return maintainability_index_from_metrics(volume, cc_total, loc)
+
+def functions_loc_and_cc(tree: ast.AST) -> Tuple[int, int]:
+    """
+    Suma LOC y CC de todas las funciones del árbol.
+    Reutiliza el recorrido compartido (definition_nodes) y la CC ya calculada por FunctionsStrategy.
+    """
     loc, cc_total = 0, 0
-    for node in ast.walk(tree):
+    for node in definition_nodes(tree):
         if isinstance(node, ast.FunctionDef):
             loc += node.end_lineno - node.lineno + 1 # Usando el atributo del nodo
             cc_total += cyclomatic_per_function(node)
+    return loc, cc_total
 
-    # 2. Halstead
-    counts = defaultdict(int)
-    tokens = tokenize.generate_tokens(io.StringIO(source).readline)
+# Tipos de token que cuentan como operandos en Halstead
+_OPERAND_TYPES = (tokenize.NAME, tokenize.NUMBER, tokenize.STRING)
+
+def halstead_volume(source: str, tokens: Optional[List[tokenize.TokenInfo]] = None) -> float:
+    """
+    Calcula el volumen de Halstead a partir de los tokens del código fuente.
+    """
+    if tokens is None:
+        tokens = tokenize.generate_tokens(io.StringIO(source).readline)
+    # N1/N2: apariciones totales; n1/n2: operadores y operandos distintos
+    operators, operands = set(), set()
+    N1 = N2 = 0
+    iskeyword = keyword.iskeyword
     for tok in tokens:
-        if tok.type == tokenize.OP or keyword.iskeyword(tok.string):
-            counts[("op", tok.string)] += 1
-        elif tok.type in (tokenize.NAME, tokenize.NUMBER, tokenize.STRING):
-            counts[("operand", tok.string)] += 1
+        if tok.type == tokenize.OP or iskeyword(tok.string):
+            N1 += 1
+            operators.add(tok.string)
+        elif tok.type in _OPERAND_TYPES:
+            N2 += 1
+            operands.add(tok.string)
 
-    n1 = len({k for k, _ in counts if k == "op"})
-    n2 = len({k for k, _ in counts if k == "operand"})
-    N1 = sum(v for (k, _), v in counts.items() if k == "op")
-    N2 = sum(v for (k, _), v in counts.items() if k == "operand")
+    n1 = len(operators)
+    n2 = len(operands)
 
     n = n1 + n2
     N = N1 + N2
-    V = N * math.log2(n) if n > 1 else 0.0
+    return N * math.log2(n) if n > 1 else 0.0
 
-    # 3. Fórmula MI (Asegurando valores mínimos > 0)
-    V = max(V, 1.0)
+def maintainability_index_from_metrics(volume: float, cc_total: float, loc: int) -> float:
+    """
+    Aplica la fórmula del MI (escalada a 0-100) a métricas ya calculadas.
+    """
+    # Asegurando valores mínimos > 0
+    V = max(volume, 1.0)
     CC = max(cc_total, 1.0)
     LOC = max(loc, 1)
     mi_raw = 171.0 - 5.2 * math.log(V) - 0.23 * CC - 16.2 * math.log(LOC)
     mi = mi_raw * 100.0 / 171.0
     return max(0.0, min(100.0, round(mi, 1)))
 
-
-class MaintainabilityStrategy(MetricStrategy):
+class MaintainabilityStrategy(FileMetricStrategy):
     """
     Calcula el Índice de Mantenibilidad (MI) estimado (0-100) para un fichero.
     """
@@ -83,4 +95,11 @@ class MaintainabilityStrategy(MetricStrategy):
         """
         Recibe la ruta del archivo y devuelve el MI.
         """
-        return compute_maintainability_index(filepath)
\ No newline at end of file
+        return compute_maintainability_index(filepath)
+
+    def compute_from_source(self, source: str, tree: Optional[ast.AST] = None,
+                            tokens: Optional[List[tokenize.TokenInfo]] = None) -> float:
+        """
+        Recibe el código fuente ya cargado (y opcionalmente su AST y sus tokens) y devuelve el MI.
+        """
+        return maintainability_index_from_source(source, tree, tokens)
\ No newline at end of file
@@ -0,0 +1,147 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+# Cambiar esta versión invalida todas las entradas (p. ej. si cambia alguna métrica)
+CACHE_VERSION = b"5"
+# Límite prudente de parámetros por consulta en SQLite
+_MAX_SQL_PARAMS = 500
+# Un fichero modificado hace menos de esto puede volver a cambiar sin que cambie su
+# mtime (resolución del sistema de ficheros), así que su (mtime, tamaño) no se guarda
+_RACY_WINDOW_NS = 2_000_000_000
+
+def metric_cache_key(filepath: Path, dup_window: int) -> Optional[str]:
+    """
+    Clave de caché de un fichero: sha256 de su contenido (más la versión y la ventana
+    de duplicación, que afecta al resultado). No depende de la ruta, así que sobrevive
+    a renombrados. Devuelve None si el fichero no se puede leer.
+    """
+    try:
+        data = Path(filepath).read_bytes()
+    except OSError:
+        return None
+    digest = hashlib.sha256(CACHE_VERSION + b":" + str(dup_window).encode() + b":")
+    digest.update(data)
+    return digest.hexdigest()
+
+
+class MetricCache:
+    """
+    Caché persistente (SQLite) de métricas por fichero, indexada por hash de contenido.
+    Si un fichero no ha cambiado entre análisis, se evita volver a parsearlo y medirlo.
+    """
+
+    def __init__(self, db_path: Path | str):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS metric_cache (
+                    hash TEXT PRIMARY KEY,
+                    blob BLOB
+                );
+            """)
+            # Atajo por (ruta, mtime, tamaño) para no leer ni hashear ficheros sin cambios
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS file_keys (
+                    path TEXT,
+                    dup_window INTEGER,
+                    mtime_ns INTEGER,
+                    size INTEGER,
+                    hash TEXT,
+                    PRIMARY KEY (path, dup_window)
+                );
+            """)
+            # Las claves guardadas en file_keys se calcularon con la versión con la que se
+            # crearon: si CACHE_VERSION ha cambiado dejan de valer y hay que volver a hashear
+            version = int(CACHE_VERSION)
+            if self._conn.execute("PRAGMA user_version").fetchone()[0] != version:
+                self._conn.execute("DELETE FROM file_keys")
+                self._conn.execute(f"PRAGMA user_version = {version}")
+
+    def keys_for(self, paths: List[Path], dup_window: int) -> List[Optional[str]]:
+        """
+        Devuelve la clave de caché de cada fichero (como metric_cache_key), en el mismo orden.
+        Si el fichero tiene el mismo mtime y tamaño que en el último análisis se reutiliza
+        la clave guardada sin leerlo; si no, se hashea su contenido y se recuerda el resultado.
+        """
+        stats: List[Optional[os.stat_result]] = []
+        for path in paths:
+            try:
+                stats.append(os.stat(path))
+            except OSError:
+                stats.append(None)
+
+        names = [str(path) for path in paths]
+        known: Dict[str, tuple] = {}
+        with self._lock:
+            for i in range(0, len(names), _MAX_SQL_PARAMS):
+                batch = names[i:i + _MAX_SQL_PARAMS]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT path, mtime_ns, size, hash FROM file_keys "
+                    f"WHERE dup_window = ? AND path IN ({placeholders})", [dup_window, *batch]
+                ).fetchall()
+                for name, mtime_ns, size, key in rows:
+                    known[name] = (mtime_ns, size, key)
+
+        keys: List[Optional[str]] = []
+        fresh = []
+        now_ns = time.time_ns()
+        for path, name, st in zip(paths, names, stats):
+            if st is None:
+                keys.append(None)
+                continue
+            entry = known.get(name)
+            if entry is not None and entry[:2] == (st.st_mtime_ns, st.st_size):
+                keys.append(entry[2])
+                continue
+            key = metric_cache_key(path, dup_window)
+            keys.append(key)
+            if key is not None and now_ns - st.st_mtime_ns > _RACY_WINDOW_NS:
+                fresh.append((name, dup_window, st.st_mtime_ns, st.st_size, key))
+
+        if fresh:
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO file_keys (path, dup_window, mtime_ns, size, hash) "
+                    "VALUES (?, ?, ?, ?, ?)", fresh)
+        return keys
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Devuelve {clave: resultado} para las claves que estén en caché."""
+        keys = list(dict.fromkeys(k for k in keys if k))
+        found: Dict[str, Any] = {}
+        with self._lock:
+            for i in range(0, len(keys), _MAX_SQL_PARAMS):
+                batch = keys[i:i + _MAX_SQL_PARAMS]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT hash, blob FROM metric_cache WHERE hash IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    try:
+                        found[key] = pickle.loads(blob)
+                    except Exception:
+                        continue  # Entrada corrupta: se recalculará
+        return found
+
+    def put_many(self, items: Dict[str, Any]) -> None:
+        """Guarda varios resultados en una única transacción."""
+        if not items:
+            return
+        rows = [(key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)) for key, value in items.items()]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO metric_cache (hash, blob) VALUES (?, ?)", rows)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -1,8 +1,50 @@
 import io
+import re
 import tokenize
-from .base import MetricStrategy
+from typing import Iterable, List, Optional
+from .base import TokenMetricStrategy
 
-class TodosStrategy(MetricStrategy):
+# Candidato a marcador: un '#' seguido, en la misma línea, de TODO o FIXME
+_MARKER_COMMENT_RE = re.compile(r'#[^\n\r]*(?:TODO|FIXME)', re.IGNORECASE)
+
+def _last_candidate_line(source: str) -> Optional[int]:
+    """
+    Devuelve la última línea que puede contener un comentario con marcador, o None si no hay ninguna.
+    """
+    # Todo comentario con marcador empieza por '#' y lleva TODO/FIXME en la misma línea,
+    # así que la expresión regular (en C) localiza los candidatos sin tokenizar.
+    # Solo se usa como filtro: un '#' dentro de un string también encaja y el
+    # conteo real sigue saliendo del tokenizer
+    last_candidate = None
+    for last_candidate in _MARKER_COMMENT_RE.finditer(source):
+        pass
+    if last_candidate is None:
+        return None
+    return source.count('\n', 0, last_candidate.start()) + 1
+
+def _count_marker_comments(tokens: Iterable[tokenize.TokenInfo], last_line: int) -> int:
+    """
+    Cuenta los comentarios con TODO/FIXME. Pasada la última línea candidata ya no puede
+    haber más marcadores, así que el recorrido se corta ahí en lugar de llegar al final.
+    """
+    count = 0
+    try:
+        for toknum, tokval, start, _, _ in tokens:
+            if start[0] > last_line:
+                break
+            # toknum es el tipo de token. Buscamos específicamente COMMENT
+            if toknum == tokenize.COMMENT:
+                # tokval es el contenido del comentario (ej: "# TODO: arreglar")
+                comment_upper = tokval.upper()
+                if 'TODO' in comment_upper or 'FIXME' in comment_upper:
+                    count += 1
+    except (tokenize.TokenError, IndentationError):
+        # En caso de código mal formado (ej: comillas sin cerrar),
+        # devolvemos 0 o el conteo parcial para evitar que la app explote.
+        pass
+    return count
+
+class TodosStrategy(TokenMetricStrategy):
     """
     Estrategia para contar comentarios TODO y FIXME.
     """
@@ -10,24 +52,22 @@ class TodosStrategy(MetricStrategy):
         if not isinstance(source, str): 
             raise TypeError("Debe ser string")
         
-        count = 0
-        try:
-            # Convertimos el string a un flujo de bytes/texto que el tokenizer pueda leer
-            # tokenize.generate_tokens espera una función readline
-            token_stream = io.StringIO(source).readline
-            tokens = tokenize.generate_tokens(token_stream)
-            
-            for toknum, tokval, _, _, _ in tokens:
-                # toknum es el tipo de token. Buscamos específicamente COMMENT
-                if toknum == tokenize.COMMENT:
-                    # tokval es el contenido del comentario (ej: "# TODO: arreglar")
-                    comment_upper = tokval.upper()
-                    if 'TODO' in comment_upper or 'FIXME' in comment_upper:
-                        count += 1
-                        
-        except (tokenize.TokenError, IndentationError):
-            # En caso de código mal formado (ej: comillas sin cerrar), 
-            # devolvemos 0 o el conteo parcial para evitar que la app explote.
-            pass
-            
-        return count
\ No newline at end of file
+        # Atajo: si no hay ningún candidato nos ahorramos tokenizar (que es con diferencia lo más caro)
+        last_line = _last_candidate_line(source)
+        if last_line is None:
+            return 0
+
+        # Convertimos el string a un flujo de bytes/texto que el tokenizer pueda leer
+        # tokenize.generate_tokens espera una función readline
+        token_stream = io.StringIO(source).readline
+        tokens = tokenize.generate_tokens(token_stream)
+        return _count_marker_comments(tokens, last_line)
+
+    def compute_tokens(self, source: str, tokens: List[tokenize.TokenInfo]) -> int:
+        """
+        Igual que compute, pero recorriendo los tokens que la fachada ya ha generado.
+        """
+        last_line = _last_candidate_line(source)
+        if last_line is None:
+            return 0
+        return _count_marker_comments(tokens, last_line)
\ No newline at end of file
@@ -1,16 +1,29 @@
-from typing import Dict, Any, List
+import hashlib
+import json
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 from pathlib import Path
 
 # Dependencias del sistema
-from config import ConfigSingleton
-from repo.repo_manager import RepoManager
+from config import CONFIG
+from repo.repo_manager import RepoManager, canonical_repo_key
 from repo.db_manager import DBManager
 from metrics.facade import MetricsFacade
+from metrics.parse_cache import MetricCache
 
 # Interfaz que implementa este Proxy
 from .subject_interface import SubjectInterface
 
+# Opciones que no cambian el resultado del análisis y no forman parte de la clave de caché
+RESULT_INDEPENDENT_OPTIONS = frozenset({"force", "workers"})
+
+def options_hash(options: Dict[str, Any]) -> str:
+    """
+    Hash estable de las opciones que afectan a las métricas (p. ej. dup_window).
+    """
+    relevant = {k: v for k, v in options.items() if k not in RESULT_INDEPENDENT_OPTIONS}
+    return hashlib.sha1(json.dumps(relevant, sort_keys=True, default=str).encode()).hexdigest()
+
 class ProxySubject(SubjectInterface):
     """
     Patrón Proxy: Actúa como intermediario entre la UI y la lógica de negocio.
@@ -18,10 +31,11 @@ class ProxySubject(SubjectInterface):
     
     def __init__(self):
         # Inicialización de todos los subsistemas
-        self.config = ConfigSingleton.get_instance()
+        self.config = CONFIG
         self.db = DBManager()
         self.repo_manager = RepoManager()
-        self.facade = MetricsFacade()
+        # Caché de métricas por contenido de fichero, junto a los repos clonados
+        self.facade = MetricsFacade(cache=MetricCache(self.config.repo_cache_dir / "metrics_cache.db"))
 
     def peticion(self, repo_url: str, force: bool = False, options: Dict[str, Any] = None) -> Dict[str, Any]:
         """
@@ -31,13 +45,30 @@ class ProxySubject(SubjectInterface):
             options = {}
 
         try:
-            # 1. CONSULTA DE CACHÉ
+            # Misma clave en la BD para las distintas formas de la URL (con .git, mayúsculas...);
+            # para clonar se sigue usando la URL tal cual
+            try:
+                repo_key = canonical_repo_key(repo_url)
+            except ValueError:
+                repo_key = repo_url
+
+            # 1. CONSULTA DE CACHÉ, por (repo, commit remoto, opciones): un commit nuevo
+            # en el remoto o unas opciones distintas no reutilizan un análisis anterior
+            opts_hash = options_hash(options)
+            commit_sha: Optional[str] = None
             if not force:
-                cached_result = self.db.get_latest_analysis(repo_url)
+                commit_sha = self.repo_manager.remote_head(repo_url)
+                if commit_sha is None:
+                    # Sin acceso al remoto: vale el último análisis con las mismas opciones
+                    cached_result = self.db.get_latest_analysis(repo_key, options_hash=opts_hash)
+                else:
+                    cached_result = self.db.get_latest_analysis(repo_key, commit_sha, opts_hash)
                 if cached_result:
                     print(f"[Proxy] HIT: Análisis recuperado de caché para {repo_url}")
                     
-                    # Marcar que viene de caché
+                    # Marcar que viene de caché. Los análisis guardados con la URL
+                    # completa (antes de la clave canónica) se muestran con la clave
+                    cached_result["repo"] = repo_key
                     cached_result["_from_cache"] = True
                     cached_result["forced"] = False
                     return cached_result
@@ -45,18 +76,17 @@ class ProxySubject(SubjectInterface):
             # 2. CÁLCULO REAL (MISS o FORCE)
             print(f"[Proxy] MISS (o force): Iniciando análisis completo para {repo_url}")
             
-            local_path = self.repo_manager.ensure_repo(repo_url)
-
-            if force:
-                print("[Proxy] Limpiando copia local...")
-                self.repo_manager.remove_repo(local_path)
-                local_path = self.repo_manager.ensure_repo(repo_url)
+            # Con force, o si el remoto tiene un commit que no está analizado, se actualiza
+            # la copia local (fetch incremental) en vez de reclonar
+            local_path = self.repo_manager.ensure_repo(repo_url, refresh=force or commit_sha is not None)
 
             print("[Proxy] Calculando métricas...")
             results = self.facade.compute_all(local_path, options)
 
             # Completar metadatos
-            results["repo"] = repo_url
+            results["repo"] = repo_key
+            results["commit_sha"] = self.repo_manager.local_head(local_path) or commit_sha
+            results["options_hash"] = opts_hash
             if "analyzed_at" not in results or not results["analyzed_at"]:
                 results["analyzed_at"] = datetime.now().isoformat()
 
@@ -1,27 +1,266 @@
+import atexit
+import logging
 import sqlite3
 import json
+import queue
+import threading
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Dict, Any, List, Optional
-from config import ConfigSingleton
+from typing import Dict, Any, Iterable, List, Optional
+from config import CONFIG
+from repo.repo_manager import canonical_repo_key
+
+log = logging.getLogger(__name__)
+
+# orjson es opcional: serializa en C, bastante más rápido que json con resultados grandes
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# zstandard es opcional: sin él los análisis se comprimen con zlib (biblioteca estándar)
+try:
+    import zstandard as zstd
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+if ORJSON_AVAILABLE:
+    def _dump_bytes(obj: Any) -> bytes:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS)
+    _loads = orjson.loads
+else:
+    def _dump_bytes(obj: Any) -> bytes:
+        # Formato compacto: sin espacios tras ',' y ':'
+        return json.dumps(obj, separators=(",", ":"), default=str).encode()
+    _loads = json.loads  # Acepta tanto str como bytes
+
+
+def _dumps(obj: Any) -> str:
+    return _dump_bytes(obj).decode()
+
+
+ZSTD_LEVEL = 3
+ZLIB_LEVEL = 6
+# Todo frame zstd empieza por este número mágico; así se distinguen de los blobs zlib
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+# Los contextos de zstd no admiten uso concurrente: uno por hilo
+_zstd_local = threading.local()
+
+
+def _compress(data: bytes) -> bytes:
+    """Comprime el JSON de un análisis (zstd si está disponible, si no zlib)."""
+    if ZSTD_AVAILABLE:
+        if not hasattr(_zstd_local, "cctx"):
+            _zstd_local.cctx = zstd.ZstdCompressor(level=ZSTD_LEVEL)
+        return _zstd_local.cctx.compress(data)
+    return zlib.compress(data, ZLIB_LEVEL)
+
+
+def _decompress(blob: bytes) -> bytes:
+    """Descomprime un blob guardado por _compress, sea cual sea el formato."""
+    if blob[:4] == _ZSTD_MAGIC:
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("El análisis está comprimido con zstd: pip install zstandard")
+        if not hasattr(_zstd_local, "dctx"):
+            _zstd_local.dctx = zstd.ZstdDecompressor()
+        return _zstd_local.dctx.decompress(blob)
+    return zlib.decompress(blob)
+
+# WAL permite lecturas concurrentes mientras hay una escritura en curso;
+# busy_timeout espera al escritor en lugar de fallar con "database is locked"
+SQLITE_PRAGMAS = """
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA mmap_size=268435456;
+    PRAGMA cache_size=-64000;
+    PRAGMA busy_timeout=5000;
+"""
+READ_POOL_SIZE = 4
+# Últimos análisis por repo que se mantienen ya deserializados en memoria
+LATEST_CACHE_SIZE = 64
+# sqlite3 reutiliza la sentencia ya preparada si el texto SQL coincide
+STATEMENT_CACHE_SIZE = 256
+# Cola del hilo escritor: save_analysis no espera al fsync; si se llena, bloquea
+WRITE_QUEUE_SIZE = 256
+# Máximo de análisis que el escritor guarda en una misma transacción
+WRITE_BATCH_SIZE = 32
+# Marca de parada para el hilo escritor
+_STOP = object()
+# Versión del esquema (PRAGMA user_version) para las migraciones que se aplican una sola vez.
+# 1: repo_url guarda la clave canónica del repositorio (canonical_repo_key)
+SCHEMA_VERSION = 1
+
+# Consultas del camino caliente, preparadas una vez por conexión
+SQL_INSERT_ANALYSIS = """
+    INSERT INTO analyses (repo_url, analyzed_at, result_blob, summary_json, commit_sha, options_hash)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+# result_blob (comprimido) en filas nuevas; result_json solo en filas anteriores a la migración
+SQL_GET_LATEST = """
+    SELECT id, result_blob, result_json FROM analyses
+    WHERE repo_url = ?
+    ORDER BY analyzed_at DESC
+    LIMIT 1
+"""
+# Sin commit conocido (remoto inaccesible): al menos deben coincidir las opciones
+SQL_GET_LATEST_FOR_OPTIONS = """
+    SELECT id, result_blob, result_json FROM analyses
+    WHERE repo_url = ? AND options_hash = ?
+    ORDER BY analyzed_at DESC
+    LIMIT 1
+"""
+# Mismo commit y mismas opciones de análisis: el resultado sigue siendo válido
+SQL_GET_LATEST_FOR_COMMIT = """
+    SELECT id, result_blob, result_json FROM analyses
+    WHERE repo_url = ? AND commit_sha = ? AND options_hash = ?
+    ORDER BY analyzed_at DESC
+    LIMIT 1
+"""
+# Métricas por fichero: una fila por fichero en lugar de dentro del JSON del análisis
+SQL_INSERT_FILE = """
+    INSERT INTO file_metrics (analysis_id, path, total_lines, num_imports, todos,
+                              duplication_ratio, maintainability_index, avg_cc,
+                              functions_json, classes_json)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+SQL_GET_FILES = """
+    SELECT path, total_lines, num_imports, todos, duplication_ratio,
+           maintainability_index, avg_cc, functions_json, classes_json
+    FROM file_metrics
+    WHERE analysis_id = ?
+    ORDER BY id
+"""
+# Solo se lee el resumen; result_json únicamente para filas sin summary_json
+SQL_LIST_ANALYSES = """
+    SELECT repo_url, analyzed_at, summary_json,
+           CASE WHEN summary_json IS NULL THEN result_json END
+    FROM analyses
+    ORDER BY analyzed_at DESC
+    LIMIT ?
+"""
 
 class DBManager:
     """
     Responsabilidad: persistir y consultar análisis (SQLite). API simple.
+    Mantiene un pool de conexiones de lectura y una única conexión de escritura
+    protegida por un lock, en lugar de abrir y cerrar una conexión por consulta.
+    Los guardados se encolan y los persiste un único hilo escritor en segundo plano.
     """
 
     def __init__(self):
         # Configuración inicial (necesaria para saber dónde está la BD)
-        self.db_path = ConfigSingleton.get_instance().db_path
+        self.db_path = CONFIG.db_path
         # Aseguramos que el directorio existe
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Conexiones persistentes: un escritor y un pool de lectores
+        self._writer_lock = threading.Lock()
+        self._writer = self._new_connection()
+        self._readers: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        for _ in range(READ_POOL_SIZE):
+            self._readers.put(self._new_connection())
+        # LRU en memoria delante de get_latest_analysis: (repo_url, commit, opciones) -> análisis
+        self._latest_lock = threading.Lock()
+        self._latest_cache: "OrderedDict[tuple, dict]" = OrderedDict()
+        # Cambia con cada escritura: una lectura que se cruce con un guardado no cachea
+        self._latest_generation = 0
+        # Análisis encolados que el escritor aún no ha confirmado (protegidos por _latest_lock):
+        # las lecturas los sirven desde aquí en lugar de esperar al escritor
+        self._pending: List[dict] = []
+        # Último error del hilo escritor; flush() lo relanza a quien necesite saberlo
+        self._write_error: Optional[Exception] = None
         # Inicializamos la BD al arrancar
         self.init_db()
+        # Escritor en segundo plano: un solo hilo, así se conserva el orden de los guardados
+        self._write_queue: "queue.Queue" = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+        self._write_thread = threading.Thread(target=self._writer_loop, name="db-writer", daemon=True)
+        self._write_thread.start()
+        # El hilo es daemon: al salir se vacía la cola para no perder análisis
+        atexit.register(self.flush)
+
+    def _new_connection(self) -> sqlite3.Connection:
+        """Abre una conexión configurada con los PRAGMA de rendimiento."""
+        conn = sqlite3.connect(str(self.db_path), check_same_thread=False,  # Se conecta a la ruta definida
+                               cached_statements=STATEMENT_CACHE_SIZE)
+        conn.executescript(SQLITE_PRAGMAS)
+        return conn
+
+    @contextmanager
+    def _read_connection(self):
+        """Presta una conexión del pool de lectura y la devuelve al terminar."""
+        conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    @contextmanager
+    def _write_connection(self):
+        """Da acceso exclusivo al escritor; hace commit al salir (o rollback si falla)."""
+        with self._writer_lock:
+            with self._writer:
+                yield self._writer
+
+    def _writer_loop(self) -> None:
+        """Saca análisis de la cola y los guarda por lotes (una transacción por lote)."""
+        while True:
+            batch = [self._write_queue.get()]
+            # Lo que se haya encolado mientras tanto va en el mismo lote, sin esperar más
+            while len(batch) < WRITE_BATCH_SIZE:
+                try:
+                    batch.append(self._write_queue.get_nowait())
+                except queue.Empty:
+                    break
+            results = [item for item in batch if item is not _STOP]
+            try:
+                self.save_many(results)
+            except Exception as e:
+                log.error("Error guardando %d análisis en la BD: %s", len(results), e)
+                self._write_error = e
+            finally:
+                # Guardados o perdidos, dejan de estar pendientes
+                saved = {id(result) for result in results}
+                with self._latest_lock:
+                    self._pending = [result for result in self._pending if id(result) not in saved]
+                for _ in batch:
+                    self._write_queue.task_done()
+            if len(results) != len(batch):
+                return
+
+    def _wait_for_writes(self) -> None:
+        """Espera a que el hilo escritor haya procesado todo lo encolado."""
+        if self._write_thread.is_alive():
+            self._write_queue.join()
+
+    def flush(self) -> None:
+        """
+        Espera a que el hilo escritor haya guardado todo lo encolado. Si algún guardado
+        en segundo plano falló desde el último flush, relanza ese error.
+        """
+        self._wait_for_writes()
+        error, self._write_error = self._write_error, None
+        if error is not None:
+            raise error
+
+    def close(self) -> None:
+        """Guarda lo pendiente y cierra todas las conexiones abiertas."""
+        if self._write_thread.is_alive():
+            self._write_queue.put(_STOP)
+            self._write_thread.join()
+        atexit.unregister(self.flush)
+        with self._writer_lock:
+            self._writer.close()
+        while not self._readers.empty():
+            self._readers.get_nowait().close()
 
     def init_db(self):
         """Crea tablas si hacen falta."""
-        conn = sqlite3.connect(str(self.db_path))  # Se conecta a la ruta definida
-        cursor = conn.cursor()
-        cursor.execute("""
+        with self._write_connection() as conn:
+            conn.execute("""
             CREATE TABLE IF NOT EXISTS analyses (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 repo_url TEXT,
@@ -29,68 +268,264 @@ class DBManager:
                 result_json TEXT
             );
         """)
-        conn.commit()
-        conn.close()
+            # Índices para get_latest_analysis (por repo) y list_analyses (por fecha):
+            # búsqueda en el índice en lugar de recorrer y ordenar toda la tabla
+            conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_analyses_repo_time
+            ON analyses (repo_url, analyzed_at DESC);
+        """)
+            conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_analyses_time
+            ON analyses (analyzed_at DESC);
+        """)
+            # Migración: resumen en su propia columna para que el historial no tenga
+            # que leer y deserializar el JSON completo de cada análisis
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(analyses)")}
+            # Commit analizado y hash de las opciones (clave de caché); NULL en filas antiguas
+            for column in ("commit_sha", "options_hash"):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE analyses ADD COLUMN {column} TEXT")
+            conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_analyses_repo_commit
+            ON analyses (repo_url, commit_sha, options_hash, analyzed_at DESC);
+        """)
+            # Migración: el JSON completo se guarda comprimido; las filas antiguas
+            # conservan result_json y se siguen leyendo desde ahí
+            if "result_blob" not in columns:
+                conn.execute("ALTER TABLE analyses ADD COLUMN result_blob BLOB")
+            if "summary_json" not in columns:
+                conn.execute("ALTER TABLE analyses ADD COLUMN summary_json TEXT")
+                try:
+                    conn.execute("""
+                        UPDATE analyses SET summary_json = json_extract(result_json, '$.summary')
+                        WHERE summary_json IS NULL
+                    """)
+                except sqlite3.OperationalError:
+                    pass  # SQLite sin JSON1: list_analyses recurre a result_json
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS file_metrics (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                analysis_id INTEGER REFERENCES analyses(id),
+                path TEXT,
+                total_lines INTEGER,
+                num_imports INTEGER,
+                todos INTEGER,
+                duplication_ratio REAL,
+                maintainability_index REAL,
+                avg_cc REAL,
+                functions_json TEXT,
+                classes_json TEXT
+            );
+        """)
+            conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_file_metrics_analysis
+            ON file_metrics (analysis_id);
+        """)
+            if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                self._migrate_repo_keys(conn)
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
 
-    def save_analysis(self, result: dict) -> None:
-        """Guarda el resultado del análisis en la base de datos como JSON."""
-        # Prepara datos: URL, fecha y serialización a JSON
+    @staticmethod
+    def _migrate_repo_keys(conn: sqlite3.Connection) -> None:
+        """
+        Migración: las filas anteriores a la clave canónica guardan la URL tal cual. Se
+        reescriben a canonical_repo_key para que la caché las siga encontrando y el
+        historial no muestre el mismo repositorio con dos nombres.
+        """
+        renames = []
+        for (repo_url,) in conn.execute("SELECT DISTINCT repo_url FROM analyses"):
+            if repo_url is None:
+                continue
+            try:
+                repo_key = canonical_repo_key(repo_url)
+            except ValueError:
+                continue  # Igual que en el Proxy: sin clave canónica se usa la URL
+            if repo_key != repo_url:
+                renames.append((repo_key, repo_url))
+        if renames:
+            conn.executemany("UPDATE analyses SET repo_url = ? WHERE repo_url = ?", renames)
+            log.info("Migradas %d claves de repositorio a su forma canónica", len(renames))
+
+    @staticmethod
+    def _analysis_row(result: dict) -> tuple:
+        """
+        Prepara datos: URL, fecha, JSON comprimido, resumen y clave de caché.
+        La lista de ficheros no va en el JSON (queda "files": null); se guarda en file_metrics.
+        """
         repo_url = result.get("repo", "unknown")
         analyzed_at = result.get("analyzed_at", datetime.now().isoformat())
-        result_json = json.dumps(result)
-
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-        # Inserta registro en la tabla analyses
-        cursor.execute("""  
-            INSERT INTO analyses (repo_url, analyzed_at, result_json)
-            VALUES (?, ?, ?)
-        """, (repo_url, analyzed_at, result_json))
-        conn.commit()
-        conn.close()
-
-    def get_latest_analysis(self, repo_url: str) -> dict | None:
-        """Devuelve los datos del repositorio (o None) si no se ha analizado anteriormente."""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-        # Selecciona el último análisis basado en la fecha
-        cursor.execute("""
-            SELECT result_json FROM analyses
-            WHERE repo_url = ?
-            ORDER BY analyzed_at DESC
-            LIMIT 1
-        """, (repo_url,))
-        row = cursor.fetchone()
-        conn.close()
-
-        if row:
-            return json.loads(row[0])  # Deserializa JSON a diccionario Python
-        return None
+        stored = dict(result, files=None) if "files" in result else result
+        result_blob = _compress(_dump_bytes(stored))
+        summary_json = _dumps(result.get("summary", {}))
+        return (repo_url, analyzed_at, result_blob, summary_json,
+                result.get("commit_sha"), result.get("options_hash"))
+
+    @staticmethod
+    def _file_row(analysis_id: int, file_data: dict) -> tuple:
+        """Fila de file_metrics para las métricas de un fichero."""
+        return (analysis_id, file_data.get("path"), file_data.get("total_lines"),
+                file_data.get("num_imports"), file_data.get("todos"),
+                file_data.get("duplication_ratio"), file_data.get("maintainability_index"),
+                file_data.get("avg_cc"), _dumps(file_data.get("functions", {})),
+                _dumps(file_data.get("public_methods", {})))
+
+    def save_analysis(self, result: dict) -> None:
+        """
+        Encola el resultado del análisis para guardarlo en la base de datos como JSON
+        comprimido. Vuelve enseguida: el fsync lo hace el hilo escritor.
+        Se encola una copia, así que quien llama puede seguir modificando su diccionario.
+        Un fallo al guardar no llega aquí: se registra en el log y lo relanza flush().
+        """
+        stored = dict(result)
+        with self._latest_lock:
+            self._pending.append(stored)
+        self._write_queue.put(stored)
+
+    def save_many(self, results: List[dict]) -> None:
+        """
+        Guarda varios análisis en una única transacción (un solo commit y un solo
+        fsync para todo el lote, en lugar de uno por análisis).
+        """
+        rows = [self._analysis_row(result) for result in results]
+        if not rows:
+            return
+
+        with self._write_connection() as conn:
+            for row, result in zip(rows, results):
+                # Inserta el registro en la tabla analyses y sus ficheros en file_metrics;
+                # las filas se generan a medida que executemany las consume
+                analysis_id = conn.execute(SQL_INSERT_ANALYSIS, row).lastrowid
+                conn.executemany(SQL_INSERT_FILE, (self._file_row(analysis_id, file_data)
+                                                   for file_data in result.get("files") or ()))
+
+        # El último análisis de estos repos puede haber cambiado: se vuelve a leer de la BD
+        with self._latest_lock:
+            self._latest_generation += 1
+            saved = {row[0] for row in rows}
+            for key in [key for key in self._latest_cache if key[0] in saved]:
+                del self._latest_cache[key]
+
+    def get_latest_analysis(self, repo_url: str, commit_sha: Optional[str] = None,
+                            options_hash: Optional[str] = None) -> dict | None:
+        """
+        Devuelve los datos del repositorio (o None) si no se ha analizado anteriormente.
+        Con commit_sha (y options_hash) solo vale un análisis de ese commit con esas opciones;
+        con solo options_hash, el último análisis de cualquier commit con esas opciones.
+        """
+        key = (repo_url, commit_sha, options_hash)
+        with self._latest_lock:
+            # Un análisis aún en cola debe verse como guardado (es el más reciente)
+            for result in reversed(self._pending):
+                if self._matches(result, repo_url, commit_sha, options_hash):
+                    return dict(result)
+            cached = self._latest_cache.get(key)
+            if cached is not None:
+                self._latest_cache.move_to_end(key)
+                # Copia superficial: quien llama puede marcar claves como "_from_cache"
+                return dict(cached)
+            generation = self._latest_generation
+
+        with self._read_connection() as conn:
+            # Selecciona el último análisis basado en la fecha
+            if commit_sha is None and options_hash is None:
+                row = conn.execute(SQL_GET_LATEST, (repo_url,)).fetchone()
+            elif commit_sha is None:
+                row = conn.execute(SQL_GET_LATEST_FOR_OPTIONS, (repo_url, options_hash)).fetchone()
+            else:
+                row = conn.execute(SQL_GET_LATEST_FOR_COMMIT, key).fetchone()
+            if not row:
+                return None
+            analysis_id, blob, result_json = row
+            # Deserializa JSON a diccionario Python
+            result = _loads(_decompress(blob) if blob is not None else result_json)
+            # Filas nuevas: el JSON guarda "files": null y los ficheros están en file_metrics
+            # (las filas antiguas los siguen llevando dentro del JSON y no pasan por aquí)
+            if "files" in result and result["files"] is None:
+                result["files"] = self._files_from_rows(conn.execute(SQL_GET_FILES, (analysis_id,)))
+
+        with self._latest_lock:
+            if generation == self._latest_generation:
+                self._latest_cache[key] = result
+                self._latest_cache.move_to_end(key)
+                if len(self._latest_cache) > LATEST_CACHE_SIZE:
+                    self._latest_cache.popitem(last=False)
+        return dict(result)
+
+    @staticmethod
+    def _matches(result: dict, repo_url: str, commit_sha: Optional[str],
+                 options_hash: Optional[str]) -> bool:
+        """Mismo criterio que las consultas SQL_GET_LATEST* sobre un análisis pendiente."""
+        if result.get("repo", "unknown") != repo_url:
+            return False
+        if commit_sha is not None:
+            return result.get("commit_sha") == commit_sha and result.get("options_hash") == options_hash
+        return options_hash is None or result.get("options_hash") == options_hash
+
+    @staticmethod
+    def _files_from_rows(rows: Iterable[tuple]) -> List[dict]:
+        """Reconstruye las métricas por fichero con el mismo formato que MetricsFacade."""
+        return [{
+            "path": path, "total_lines": total_lines, "num_imports": num_imports,
+            "todos": todos, "duplication_ratio": duplication_ratio,
+            "maintainability_index": maintainability_index, "avg_cc": avg_cc,
+            "functions": _loads(functions_json), "public_methods": _loads(classes_json)
+        } for (path, total_lines, num_imports, todos, duplication_ratio,
+               maintainability_index, avg_cc, functions_json, classes_json) in rows]
+
+    def get_analysis_files(self, analysis_id: int) -> List[dict]:
+        """Devuelve las métricas por fichero de un análisis sin leer el análisis completo."""
+        # Se busca por id, que solo existe una vez guardado
+        self._wait_for_writes()
+        with self._read_connection() as conn:
+            return self._files_from_rows(conn.execute(SQL_GET_FILES, (analysis_id,)))
 
     def list_analyses(self, limit: int = 50) -> list:
-        """Lista el historial de análisis (solo resúmenes) ordenados por fecha."""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT repo_url, analyzed_at, result_json 
-            FROM analyses
-            ORDER BY analyzed_at DESC
-            LIMIT ?
-        """, (limit,))
-        rows = cursor.fetchall()
-        conn.close()
+        """
+        Lista el historial de análisis (solo resúmenes) ordenados por fecha.
+        Los análisis aún en cola aparecen los primeros, sin esperar al escritor.
+        """
+        with self._latest_lock:
+            pending = self._pending[::-1]
+        with self._read_connection() as conn:
+            rows = conn.execute(SQL_LIST_ANALYSES, (limit,)).fetchall()
+
+        history = None
+        if all(summary_str is not None for _, _, summary_str, _ in rows):
+            try:
+                # Camino rápido: todas las filas tienen summary_json, sin try por fila
+                history = [{"repo": repo_url, "analyzed_at": analyzed_at, "summary": _loads(summary_str)}
+                           for repo_url, analyzed_at, summary_str, _ in rows]
+            except ValueError:
+                pass  # Algún resumen corrupto: se recurre a la versión tolerante
+        if history is None:
+            history = self._history_from_rows(rows)
+        if not pending:
+            return history
+
+        # El escritor puede haber confirmado alguno entre las dos lecturas: no se repite
+        stored = {(entry["repo"], entry["analyzed_at"]) for entry in history}
+        queued = [{"repo": result.get("repo", "unknown"), "analyzed_at": result.get("analyzed_at"),
+                   "summary": result.get("summary", {})}
+                  for result in pending
+                  if (result.get("repo", "unknown"), result.get("analyzed_at")) not in stored]
+        return (queued + history)[:limit]
 
+    @staticmethod
+    def _history_from_rows(rows: list) -> list:
+        """Versión tolerante: filas sin summary_json o con JSON corrupto (se omiten)."""
         history = []
-        for repo_url, analyzed_at, json_str in rows:
+        for repo_url, analyzed_at, summary_str, json_str in rows:
             try:
-                data = json.loads(json_str)
-                # Extraemos solo el resumen para la lista
-                summary = data.get("summary", {})
+                if summary_str is not None:
+                    summary = _loads(summary_str)
+                else:
+                    # Extraemos solo el resumen para la lista
+                    summary = _loads(json_str).get("summary", {})
                 history.append({
                     "repo": repo_url,
                     "analyzed_at": analyzed_at,
                     "summary": summary
                 })
-            except:
+            except Exception:
                 continue
         return history
\ No newline at end of file
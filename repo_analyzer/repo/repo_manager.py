@@ -1,8 +1,43 @@
+import os
 import subprocess
 import shutil
+import threading
+import uuid
+from functools import lru_cache
 from pathlib import Path
+from typing import Dict, Optional
 from urllib.parse import urlparse
-from config import ConfigSingleton 
+from config import CONFIG
+
+# Tope de URLs recordadas (las URL vienen del usuario; se evita que crezca sin límite)
+PATH_CACHE_SIZE = 256
+# Subdirectorio de la caché donde se mueven los repos a borrar (mismo sistema de ficheros)
+TRASH_DIR_NAME = ".trash"
+# Segundos máximos para las consultas rápidas a git (ls-remote, rev-parse): van dentro
+# de la petición web, así que un remoto que no responde se trata como sin acceso
+GIT_QUERY_TIMEOUT = 10
+# Sin terminal: si el remoto pide credenciales, git falla en vez de quedarse esperando
+GIT_QUERY_ENV = {**os.environ, "GIT_TERMINAL_PROMPT": "0"}
+
+@lru_cache(maxsize=PATH_CACHE_SIZE)
+def canonical_repo_key(repo_url: str) -> str:
+    """
+    Clave canónica de un repositorio ("usuario/repo", en minúsculas) a partir de su URL.
+    Las distintas formas de una misma URL (con o sin .git, barra final, mayúsculas, SSH)
+    dan la misma clave, que se usa tanto para la ruta local como para la caché en la BD.
+    Lanza ValueError si la URL no tiene ruta.
+    """
+    url = repo_url.strip()
+    # Sintaxis SSH tipo scp ("git@github.com:usuario/repo.git") a URL normal
+    if "://" not in url and ":" in url:
+        url = "ssh://" + url.replace(":", "/", 1)
+    repo_name = urlparse(url).path.strip('/')
+    # Solo el sufijo: ".git" en mitad del nombre forma parte de él
+    if repo_name.endswith('.git'):
+        repo_name = repo_name[:-len('.git')].rstrip('/')
+    if not repo_name:
+        raise ValueError("URL de repositorio no válida.")
+    return repo_name.lower()
 
 class RepoManager:
     """
@@ -10,25 +45,43 @@ class RepoManager:
     """
     
     def __init__(self):
-        self.config = ConfigSingleton.get_instance()  # Obtiene la configuración Singleton
+        self.config = CONFIG  # Configuración Singleton
         self.cache_dir = self.config.repo_cache_dir
         
         self.cache_dir.mkdir(parents=True, exist_ok=True)  # Asegurarse de que el directorio de caché exista
+        # Rutas locales ya resueltas: una petición llama varias veces a _get_local_path
+        self._path_cache: Dict[str, Path] = {}
+        # Restos de borrados que no terminaron en ejecuciones anteriores
+        self.trash_dir = self.cache_dir / TRASH_DIR_NAME
+        if self.trash_dir.is_dir():
+            for leftover in self.trash_dir.iterdir():
+                self._delete_in_background(leftover)
+
+    @staticmethod
+    def _delete_in_background(path: Path) -> None:
+        """Borra un directorio en un hilo aparte para no bloquear la petición."""
+        threading.Thread(target=shutil.rmtree, args=(path,), kwargs={"ignore_errors": True},
+                         daemon=True).start()
 
     def _get_local_path(self, repo_url: str) -> Path:
         """
         Genera la ruta local segura para un repositorio basado en su URL.
+        El resultado solo depende de la URL, así que se calcula una vez por URL.
         """
-        # Extraer el nombre del repositorio a partir de la URL (ej: "user/repo.git")
-        # Esto simplifica la URL para usarla como nombre de subdirectorio.
+        cached = self._path_cache.get(repo_url)
+        if cached is None:
+            if len(self._path_cache) >= PATH_CACHE_SIZE:
+                self._path_cache.clear()
+            cached = self._path_cache[repo_url] = self._compute_local_path(repo_url)
+        return cached
+
+    def _compute_local_path(self, repo_url: str) -> Path:
+        """
+        Deriva la ruta local a partir de la URL (sin caché).
+        """
+        # El nombre del repositorio (ej: "user/repo") se usa como nombre de subdirectorio
         try:
-            parsed_url = urlparse(repo_url)
-            repo_name = parsed_url.path.strip('/').replace('.git', '')
-            
-            if not repo_name:
-                raise ValueError("URL de repositorio no válida.")
-                
-            return self.cache_dir / repo_name.lower()
+            return self.cache_dir / canonical_repo_key(repo_url)
         
         except Exception:  # En caso de URL malformada, usar un hash o un nombre genérico
             import hashlib
@@ -46,23 +99,125 @@ class RepoManager:
     def remove_repo(self, repo_path: Path) -> None:
         """
         Borra el directorio del repositorio local (usado para forzar recálculo).
+        El directorio se renombra a la papelera (operación atómica e inmediata) y el
+        borrado real de sus ficheros ocurre en segundo plano, solapado con el nuevo clon.
         """
         if repo_path.is_dir():
             print(f"Eliminando repositorio local en: {repo_path}")
-            shutil.rmtree(repo_path)  # Elimina directorios con contenido
+            try:
+                self.trash_dir.mkdir(parents=True, exist_ok=True)
+                trash = self.trash_dir / uuid.uuid4().hex
+                repo_path.rename(trash)
+            except OSError:
+                shutil.rmtree(repo_path)  # Elimina directorios con contenido
+            else:
+                self._delete_in_background(trash)
         else:
             print(f"Advertencia: El directorio {repo_path} no existe o no es un directorio.")
 
-    def ensure_repo(self, repo_url: str) -> Path:
+    @staticmethod
+    def _git_output(command: list) -> Optional[str]:
+        """
+        Ejecuta un comando git y devuelve su salida (sin espacios), o None si falla
+        o si no termina en GIT_QUERY_TIMEOUT segundos.
+        """
+        try:
+            completed = subprocess.run(command, check=True, capture_output=True, text=True,
+                                       timeout=GIT_QUERY_TIMEOUT, env=GIT_QUERY_ENV)
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired, FileNotFoundError):
+            return None
+        return completed.stdout.strip()
+
+    def remote_head(self, remote: str, local_path: Optional[Path] = None) -> Optional[str]:
+        """
+        Devuelve el SHA de HEAD en el remoto (una URL, o 'origin' dentro de local_path)
+        usando git ls-remote, sin clonar nada. None si falla.
+        """
+        cwd = ["-C", str(local_path)] if local_path is not None else []
+        output = self._git_output(["git", *cwd, "ls-remote", remote, "HEAD"])
+        if not output:
+            return None
+        return output.split()[0]
+
+    def local_head(self, local_path: Path) -> Optional[str]:
+        """
+        Devuelve el SHA del commit en el que está el clon local, o None si falla.
+        """
+        return self._git_output(["git", "-C", str(local_path), "rev-parse", "HEAD"])
+
+    def refresh_repo(self, local_path: Path) -> bool:
+        """
+        Actualiza un clon existente con un fetch superficial de HEAD en lugar de volver
+        a clonarlo. Deja el directorio igual que un clon limpio del último commit.
+        Devuelve False si no es un clon válido o git falla (el llamante debe reclonar).
+        """
+        if not (local_path / ".git").is_dir():
+            return False
+        # Si el remoto sigue en el mismo commit basta con limpiar la copia local:
+        # una ida y vuelta de ls-remote en lugar de un fetch
+        local_head = self.local_head(local_path)
+        if local_head is not None and self.remote_head("origin", local_path) == local_head:
+            commands = [["git", "-C", str(local_path), "reset", "--hard", "HEAD"]]
+        else:
+            commands = [
+                ["git", "-C", str(local_path), "fetch", "--depth", "1", "origin", "HEAD"],
+                ["git", "-C", str(local_path), "reset", "--hard", "FETCH_HEAD"],
+            ]
+        commands.append(["git", "-C", str(local_path), "clean", "-ffdx"])  # Ficheros no versionados fuera
+        try:
+            for command in commands:
+                subprocess.run(command, check=True, capture_output=True, text=True)
+        except (subprocess.CalledProcessError, FileNotFoundError) as e:
+            print(f"Advertencia: No se pudo actualizar {local_path}: {getattr(e, 'stderr', e)}")
+            return False
+        print(f"Repositorio actualizado en: {local_path}")
+        return True
+
+    def _clone(self, repo_url: str, local_path: Path) -> None:
+        """
+        Clon parcial: sin blobs (--filter=blob:none) y con sparse-checkout de los *.py,
+        que son los únicos ficheros que analizan las métricas. Si la versión de git no
+        admite alguna opción, se recurre al clon superficial completo de siempre.
+        """
+        def git(*args: str) -> None:
+            subprocess.run(
+                ["git", *args],
+                check=True,  # Lanza una excepción si el comando falla (ej: repo no existe, no hay git)
+                capture_output=True,
+                text=True
+            )
+
+        try:
+            git("clone", "--depth", "1", "--filter=blob:none", "--no-checkout", repo_url, str(local_path))
+        except subprocess.CalledProcessError:
+            if local_path.exists():
+                shutil.rmtree(local_path)
+            # Comando git clone (sin clon parcial)
+            git("clone", "--depth", "1", repo_url, str(local_path))
+            return
+
+        try:
+            git("-C", str(local_path), "sparse-checkout", "set", "--no-cone", "*.py")
+        except subprocess.CalledProcessError:
+            pass  # git < 2.35: se hace checkout completo
+        git("-C", str(local_path), "checkout")
+
+    def ensure_repo(self, repo_url: str, refresh: bool = False) -> Path:
         """
         Asegura que el repositorio indicado esté disponible localmente y lo clona si no existe.
+        Con refresh=True un clon existente se actualiza con fetch (incremental) y, solo si
+        eso falla, se borra y se vuelve a clonar.
         Devuelve el Path al directorio local del repositorio.
         """
         local_path = self._get_local_path(repo_url)
 
         if self.is_cloned(repo_url):
-            print(f"Repositorio ya clonado en: {local_path}. Saltando clonación.")
-            return local_path
+            if not refresh:
+                print(f"Repositorio ya clonado en: {local_path}. Saltando clonación.")
+                return local_path
+            if self.refresh_repo(local_path):
+                return local_path
+            self.remove_repo(local_path)
 
         print(f"Clonando {repo_url} en {local_path}...")  # Si no está clonado, lo clona
 
@@ -70,13 +225,7 @@ class RepoManager:
         try:
             local_path.parent.mkdir(parents=True, exist_ok=True)  # Crea el directorio padre si no existe
             
-            # Comando git clone
-            subprocess.run(
-                ["git", "clone", "--depth", "1", repo_url, str(local_path)], 
-                check=True,  # Lanza una excepción si el comando falla (ej: repo no existe, no hay git)
-                capture_output=True, 
-                text=True
-            )
+            self._clone(repo_url, local_path)
             print("Clonación completada con éxito.")
             return local_path
             
@@ -0,0 +1,20 @@
+import os
+import sys
+from pathlib import Path
+
+# Raíz del proyecto (repo_analyzer/) en el path una sola vez para toda la suite,
+# en lugar de que cada módulo de tests añada la suya
+PROJECT_ROOT = str(Path(__file__).resolve().parent.parent)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+# Las funciones @njit se ejecutan como Python normal durante los tests: compilar con
+# Numba en cada proceso de pytest cuesta segundos. El camino compilado se prueba una
+# vez, en un subproceso, en test_numba_smoke.py (marcado con `with_numba`).
+# Tiene que fijarse antes de que se importe metrics.duplication.
+os.environ.setdefault("NUMBA_DISABLE_JIT", "1")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "slow: pruebas lentas (grandes volúmenes de datos)")
+    config.addinivalue_line("markers", "with_numba: pruebas que compilan de verdad con Numba")
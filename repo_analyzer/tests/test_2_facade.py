@@ -1,15 +1,8 @@
 import pytest
 from unittest.mock import MagicMock, patch
-import sys
 import os
 from pathlib import Path
 
-# Configuración del path
-current_dir = os.path.dirname(os.path.abspath(__file__))
-project_root = os.path.dirname(current_dir)
-if project_root not in sys.path:
-    sys.path.insert(0, project_root)
-
 # Importamos lo que vamos a probar
 from metrics.facade import MetricsFacade, list_py_files
 
@@ -118,31 +111,130 @@ class TestMetricsFacadeTDD:
         """
         Si un archivo falla al leerse, el análisis debe continuar con el resto.
         """
-        # Simulamos un archivo corrupto haciendo que read_text lance excepción
-        # OJO: Como estamos mockeando 'Path.read_text' dentro del código es difícil sin monkeypatch.
-        # En su lugar, usaremos un archivo con permisos restringidos si el OS lo permite,
-        # o confiaremos en que el código tiene un try-except.
-        
+        # Simulamos un archivo corrupto haciendo que read_text lance excepción solo para
+        # toxic.py (sin chmod: no depende del SO ni de si los tests corren como root)
         toxic = repo_structure / "toxic.py"
         toxic.write_text("boom")
-        
-        # En Linux/Mac esto funciona para denegar lectura
-        try:
-            toxic.chmod(0o000)
-        except:
-            pytest.skip("No se pueden cambiar permisos en este OS")
+
+        real_read_text = Path.read_text
+        def read_text(path, *args, **kwargs):
+            if path.name == "toxic.py":
+                raise PermissionError(f"Permiso denegado: {path}")
+            return real_read_text(path, *args, **kwargs)
 
         facade = MetricsFacade()
         try:
-            results = facade.compute_all(repo_structure, {})
+            with patch.object(Path, "read_text", autospec=True, side_effect=read_text):
+                results = facade.compute_all(repo_structure, {})
             # Debería haber procesado main.py y utils.py (2 archivos), ignorando toxic.py
-            # O toxic.py cuenta como archivo pero no suma métricas.
-            # Según nuestra implementación, si falla el read, hace 'continue', así que no cuenta en los resultados detallados.
-            
-            # Recuperamos permisos para poder borrar
-            toxic.chmod(0o777)
-            
+            # Según nuestra implementación, si falla el read, el fichero no cuenta en los resultados detallados.
             assert len(results["files"]) >= 2
-        except Exception as e:
-            toxic.chmod(0o777)
+            assert "toxic.py" not in [Path(f["path"]).name for f in results["files"]]
+        except PermissionError as e:
             pytest.fail(f"La fachada se detuvo por un archivo corrupto: {e}")
+
+    # --------------------------------------------------------------------------
+    # 4. PARALELISMO (ProcessPoolExecutor)
+    # --------------------------------------------------------------------------
+    def test_parallel_matches_sequential(self, tmp_path, monkeypatch):
+        """
+        El reparto en procesos debe dar exactamente el mismo resultado que el
+        análisis secuencial (mismo orden de ficheros y mismos totales).
+        El pool se crea una vez y se reutiliza en los análisis siguientes.
+        """
+        from metrics import facade as facade_module
+
+        monkeypatch.setattr(facade_module, "PARALLEL_MIN_BYTES", 0)
+        for i in range(20):
+            (tmp_path / f"mod_{i}.py").write_text(f"def f{i}(x):\n    if x:\n        return {i}\n    return 0\n")
+
+        facade = MetricsFacade()
+        sequential = facade.compute_all(tmp_path, {"workers": 1})
+        parallel = facade.compute_all(tmp_path, {"workers": 2})
+        pool = facade_module._pool
+
+        assert parallel["summary"] == sequential["summary"]
+        assert [f["path"] for f in parallel["files"]] == [f["path"] for f in sequential["files"]]
+        assert pool is not None
+        assert facade.compute_all(tmp_path, {"workers": 2})["summary"] == sequential["summary"]
+        assert facade_module._pool is pool
+
+    def test_small_repo_does_not_start_pool(self, tmp_path):
+        """Por debajo de PARALLEL_MIN_BYTES el análisis se hace en este proceso."""
+        from metrics import facade as facade_module
+
+        facade_module.shutdown_pool()
+        for i in range(20):
+            (tmp_path / f"mod_{i}.py").write_text(f"def f{i}():\n    return {i}\n")
+
+        MetricsFacade().compute_all(tmp_path, {"workers": 2})
+
+        assert facade_module._pool is None
+
+    # --------------------------------------------------------------------------
+    # 5. list_py_files REFLEJA LOS CAMBIOS DEL ÁRBOL
+    # --------------------------------------------------------------------------
+    def test_list_py_files_sees_new_files(self, repo_structure):
+        """
+        Una segunda llamada debe ver un fichero añadido en un subdirectorio,
+        sin depender de que cambie el mtime del directorio.
+        """
+        first = list_py_files(repo_structure)
+        assert list_py_files(repo_structure) == first
+
+        (repo_structure / "src" / "nuevo.py").write_text("code")
+
+        names = [f.name for f in list_py_files(repo_structure)]
+        assert "nuevo.py" in names
+
+    # --------------------------------------------------------------------------
+    # 6. CACHÉ PERSISTENTE POR CONTENIDO
+    # --------------------------------------------------------------------------
+    def test_metric_cache_skips_unchanged_files(self, tmp_path):
+        """
+        En un segundo análisis, los ficheros cuyo contenido no ha cambiado deben
+        salir de la caché sin volver a calcular sus métricas.
+        """
+        from metrics.parse_cache import MetricCache
+
+        repo = tmp_path / "repo"
+        repo.mkdir()
+        (repo / "a.py").write_text("def f(x):\n    return x\n")
+        (repo / "b.py").write_text("import os\n")
+
+        facade = MetricsFacade(cache=MetricCache(tmp_path / "cache.db"))
+        first = facade.compute_all(repo, {"workers": 1})
+
+        with patch("metrics.facade._analyze_file", side_effect=AssertionError("no debería recalcular")):
+            second = facade.compute_all(repo, {"workers": 1})
+
+        assert second["summary"] == first["summary"]
+
+        # Un fichero modificado sí se recalcula; con force se recalcula todo
+        (repo / "b.py").write_text("import os\nimport sys\n")
+        third = facade.compute_all(repo, {"workers": 1})
+        assert third["summary"]["total_lines"] == first["summary"]["total_lines"] + 1
+        assert facade.compute_all(repo, {"workers": 1, "force": True})["summary"] == third["summary"]
+
+    def test_metric_cache_stat_shortcut(self, tmp_path):
+        """
+        Un fichero con el mismo mtime y tamaño que en el análisis anterior no debe
+        volver a leerse para calcular su clave; si cambia su mtime, sí.
+        """
+        from metrics.parse_cache import MetricCache
+
+        repo = tmp_path / "repo"
+        repo.mkdir()
+        source = repo / "a.py"
+        source.write_text("def f(x):\n    return x\n")
+        os.utime(source, ns=(10**18, 10**18))  # Fuera de la ventana de carrera
+
+        cache = MetricCache(tmp_path / "cache.db")
+        first = cache.keys_for([source], 4)
+
+        with patch("metrics.parse_cache.metric_cache_key", side_effect=AssertionError("no debería leer")):
+            assert cache.keys_for([source], 4) == first
+
+        source.write_text("def g(x):\n    return x\n")
+        os.utime(source, ns=(10**18 + 1, 10**18 + 1))
+        assert cache.keys_for([source], 4) != first
@@ -1,11 +1,6 @@
 import pytest
-import sys
-import os
 import ast
 
-# Configuración del entorno de pruebas
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-
 try:
     from metrics.classes import ClassesStrategy
 except ImportError:
@@ -19,7 +14,7 @@ class TestClassesStrategyAudit:
     siguiendo las convenciones de nomenclatura de Python y soportando sintaxis moderna.
     """
 
-    @pytest.fixture
+    @pytest.fixture(scope="module")
     def strategy(self):
         return ClassesStrategy()
 
@@ -107,4 +102,52 @@ class Config:
         pass
 """
         result = strategy.compute(code)
-        assert result == {"Config": 3}
\ No newline at end of file
+        assert result == {"Config": 3}
+    # --------------------------------------------------------------------------
+    # 5. PRUEBA DE AST COMPARTIDO
+    # --------------------------------------------------------------------------
+    def test_shared_tree_single_walk(self, strategy):
+        """
+        Verifica que ClassesStrategy y FunctionsStrategy puedan trabajar sobre el mismo
+        árbol (como hace la fachada) sin volver a recorrerlo, con el mismo resultado.
+        """
+        from metrics.functions import FunctionsStrategy
+        from metrics.base import definition_nodes
+
+        code = "class A:\n    def run(self):\n        pass\n\ndef helper(x):\n    return x\n"
+        tree = ast.parse(code)
+
+        assert strategy.compute_ast(tree) == strategy.compute(code)
+        assert FunctionsStrategy().compute_ast(tree) == FunctionsStrategy().compute(code)
+        # El recorrido queda guardado en el árbol y se reutiliza
+        assert definition_nodes(tree) is definition_nodes(tree)
+
+    # --------------------------------------------------------------------------
+    # 6. PRUEBA DE CLASES ANIDADAS (Nombres cualificados)
+    # --------------------------------------------------------------------------
+    def test_nested_classes_collision(self, strategy):
+        """
+        Verifica que dos clases con el mismo nombre en ámbitos distintos no se pisen.
+        Las anidadas se identifican por su nombre cualificado, como __qualname__.
+        """
+        code = """
+class Handler:
+    def run(self):
+        pass
+
+class Outer:
+    class Handler:
+        def a(self):
+            pass
+        def b(self):
+            pass
+
+def factory():
+    class Handler:
+        async def go(self):
+            pass
+    return Handler
+"""
+        result = strategy.compute(code)
+        assert result == {"Handler": 1, "Outer": 0, "Outer.Handler": 2,
+                          "factory.<locals>.Handler": 1}
@@ -0,0 +1,199 @@
+import sqlite3
+import threading
+from contextlib import closing
+import pytest
+from unittest.mock import Mock, patch
+
+from repo import db_manager
+from repo.db_manager import DBManager
+
+
+def make_result(repo: str, analyzed_at: str = "2024-01-01T10:00:00", **extra) -> dict:
+    """Resultado mínimo con la misma forma que el de MetricsFacade."""
+    result = {
+        "repo": repo,
+        "analyzed_at": analyzed_at,
+        "summary": {"num_files": 1, "total_lines": 3},
+        "files": [{
+            "path": "pkg/mod.py", "total_lines": 3, "num_imports": 1, "todos": 0,
+            "duplication_ratio": 0.0, "maintainability_index": 90.5, "avg_cc": 2.0,
+            "functions": {"f": {"cc": 2, "loc": 3}}, "public_methods": {"A": 1}
+        }],
+    }
+    result.update(extra)
+    return result
+
+
+def query(db_path, sql: str, params: tuple = ()) -> list:
+    """Consulta directa a la BD, con una conexión propia que se cierra al terminar."""
+    with closing(sqlite3.connect(db_path)) as conn, conn:
+        return conn.execute(sql, params).fetchall()
+
+
+class TestDBManager:
+    """
+    Persistencia de análisis en SQLite sobre una BD temporal (tmp_path):
+    escritor en segundo plano, lecturas sin esperarlo y errores de guardado.
+    """
+
+    @pytest.fixture
+    def db(self, tmp_path):
+        """DBManager sobre una BD nueva; se cierra (y vacía la cola) al terminar."""
+        with patch.object(db_manager, "CONFIG", Mock(db_path=tmp_path / "analysis.db")):
+            manager = DBManager()
+        yield manager
+        manager.close()
+
+    @pytest.fixture
+    def blocked_writer(self, db):
+        """
+        Retiene el guardado del hilo escritor hasta llamar a release(): permite ver
+        qué devuelven las lecturas mientras un análisis sigue en la cola.
+        """
+        release = threading.Event()
+        save_many = db.save_many
+
+        def slow_save(results):
+            release.wait(5)
+            save_many(results)
+
+        with patch.object(db, "save_many", side_effect=slow_save):
+            yield release
+            release.set()
+            db.flush()
+
+    # --------------------------------------------------------------------------
+    # 1. LECTURAS SIN ESPERAR AL ESCRITOR
+    # --------------------------------------------------------------------------
+    def test_queued_analysis_is_read_without_waiting(self, db, blocked_writer):
+        """Un análisis aún en cola ya lo ven get_latest_analysis y list_analyses."""
+        db.save_analysis(make_result("user/repo"))
+
+        assert db.get_latest_analysis("user/repo")["summary"]["total_lines"] == 3
+        assert [entry["repo"] for entry in db.list_analyses()] == ["user/repo"]
+        # Las lecturas no han esperado: el guardado sigue sin terminar
+        assert db._write_queue.unfinished_tasks == 1
+
+        blocked_writer.set()
+        db.flush()
+        # Ya guardado, aparece una sola vez
+        assert [entry["repo"] for entry in db.list_analyses()] == ["user/repo"]
+
+    def test_save_analysis_stores_a_copy(self, db, blocked_writer):
+        """Las marcas que el Proxy añade después de guardar no llegan a la BD."""
+        result = make_result("user/repo")
+        db.save_analysis(result)
+        result["_from_cache"] = False
+        result["forced"] = True
+
+        blocked_writer.set()
+        db.flush()
+
+        stored = db.get_latest_analysis("user/repo")
+        assert "_from_cache" not in stored and "forced" not in stored
+
+    # --------------------------------------------------------------------------
+    # 2. ERRORES DEL ESCRITOR
+    # --------------------------------------------------------------------------
+    def test_write_error_is_raised_by_flush(self, db):
+        """Un fallo en segundo plano se relanza una vez en flush() y el análisis se descarta."""
+        with patch.object(db, "save_many", side_effect=sqlite3.OperationalError("disk I/O error")):
+            db.save_analysis(make_result("user/repo"))
+            with pytest.raises(sqlite3.OperationalError):
+                db.flush()
+
+        db.flush()
+        assert db.get_latest_analysis("user/repo") is None
+
+    # --------------------------------------------------------------------------
+    # 3. MÉTRICAS POR FICHERO (file_metrics)
+    # --------------------------------------------------------------------------
+    def test_file_metrics_round_trip(self, db):
+        """Los ficheros se guardan en file_metrics y el análisis se reconstruye igual."""
+        result = make_result("user/repo")
+        db.save_analysis(result)
+        db.flush()
+
+        assert query(db.db_path, "SELECT COUNT(*) FROM file_metrics") == [(1,)]
+        assert db.get_latest_analysis("user/repo")["files"] == result["files"]
+
+    def test_get_analysis_files(self, db):
+        """get_analysis_files devuelve los ficheros de un análisis concreto por su id."""
+        db.save_analysis(make_result("user/repo"))
+        other = make_result("user/other", "2024-01-02T10:00:00")
+        other["files"][0]["path"] = "otro.py"
+        db.save_analysis(other)
+        db.flush()
+
+        ids = dict(query(db.db_path, "SELECT repo_url, id FROM analyses"))
+        assert [f["path"] for f in db.get_analysis_files(ids["user/other"])] == ["otro.py"]
+        assert db.get_analysis_files(ids["user/repo"]) == make_result("user/repo")["files"]
+        assert db.get_analysis_files(-1) == []
+
+    # --------------------------------------------------------------------------
+    # 4. ORDEN DE LOS GUARDADOS Y CLAVE DE CACHÉ
+    # --------------------------------------------------------------------------
+    def test_flush_keeps_save_order(self, db):
+        """Tras flush() los análisis están guardados en el orden en que se encolaron."""
+        for hour in range(10, 15):
+            db.save_analysis(make_result("user/repo", f"2024-01-01T{hour}:00:00", run=hour))
+        db.flush()
+
+        dates = [row[0] for row in query(db.db_path, "SELECT analyzed_at FROM analyses ORDER BY id")]
+        assert dates == [f"2024-01-01T{hour}:00:00" for hour in range(10, 15)]
+        assert db.get_latest_analysis("user/repo")["run"] == 14
+
+    @staticmethod
+    def save_lookup_cases(db):
+        db.save_analysis(make_result("user/repo", "2024-01-01T10:00:00", commit_sha="a", options_hash="x", run=1))
+        db.save_analysis(make_result("user/repo", "2024-01-01T11:00:00", commit_sha="a", options_hash="y", run=2))
+        db.save_analysis(make_result("user/repo", "2024-01-01T12:00:00", commit_sha="b", options_hash="x", run=3))
+
+    @staticmethod
+    def assert_lookups(db):
+        assert db.get_latest_analysis("user/repo", "a", "x")["run"] == 1
+        assert db.get_latest_analysis("user/repo", "a", "y")["run"] == 2
+        assert db.get_latest_analysis("user/repo", "b", "y") is None
+        assert db.get_latest_analysis("user/repo", "c", "x") is None
+        # Sin commit (remoto inaccesible): el último con esas opciones
+        assert db.get_latest_analysis("user/repo", options_hash="x")["run"] == 3
+        assert db.get_latest_analysis("user/repo", options_hash="y")["run"] == 2
+        assert db.get_latest_analysis("user/repo", options_hash="z") is None
+        assert db.get_latest_analysis("user/repo")["run"] == 3
+        assert db.get_latest_analysis("user/other") is None
+
+    def test_lookup_by_commit_and_options(self, db):
+        """Solo vale un análisis del mismo commit con las mismas opciones."""
+        self.save_lookup_cases(db)
+        db.flush()
+        self.assert_lookups(db)
+
+    def test_lookup_on_queued_analyses(self, db, blocked_writer):
+        """Los análisis aún en cola siguen el mismo criterio que las consultas SQL."""
+        self.save_lookup_cases(db)
+        self.assert_lookups(db)
+
+    # --------------------------------------------------------------------------
+    # 5. MIGRACIÓN A CLAVES CANÓNICAS
+    # --------------------------------------------------------------------------
+    def test_repo_key_migration_runs_once(self, tmp_path):
+        """
+        Las URL guardadas antes de la clave canónica se migran al abrir la BD, y solo
+        una vez: con user_version ya al día no se vuelve a recorrer la tabla.
+        """
+        db_path = tmp_path / "analysis.db"
+        insert = "INSERT INTO analyses (repo_url, analyzed_at) VALUES (?, '2024-01-01')"
+        with patch.object(db_manager, "CONFIG", Mock(db_path=db_path)):
+            DBManager().close()
+            # BD de antes de la migración, con una fila guardada con la URL completa
+            query(db_path, "PRAGMA user_version = 0")
+            query(db_path, insert, ("https://github.com/User/Repo.git",))
+
+            DBManager().close()
+            assert query(db_path, "SELECT repo_url FROM analyses") == [("user/repo",)]
+            assert query(db_path, "PRAGMA user_version") == [(db_manager.SCHEMA_VERSION,)]
+
+            query(db_path, insert, ("git@github.com:User/Other.git",))
+            with patch.object(DBManager, "_migrate_repo_keys") as migrate:
+                DBManager().close()
+            migrate.assert_not_called()
@@ -1,12 +1,7 @@
 import pytest
-import sys
-import os
 from pathlib import Path
 from unittest.mock import MagicMock, patch
 
-# Configuración del path
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-
 try:
     from metrics.facade import MetricsFacade, list_py_files
 except ImportError:
@@ -21,12 +16,14 @@ class TestMetricsFacadeAudit:
     o estructuras de repositorio inusuales.
     """
 
-    @pytest.fixture
-    def mock_strategies(self):
+    @pytest.fixture(scope="module")
+    def patched_strategies(self):
         """
         Aísla la Fachada mediante el uso de Mocks para todas las estrategias internas.
         Permite validar la lógica de orquestación y agregación de resultados sin
         depender de la implementación específica de cada métrica.
+        Los patch se aplican una sola vez para todo el módulo (desde el primer test
+        que los pide hasta el final): ningún test de este módulo usa estrategias reales.
         """
         with patch("metrics.facade.LinesStrategy") as MockLines, \
              patch("metrics.facade.NumImportsStrategy") as MockImports, \
@@ -51,6 +48,13 @@ class TestMetricsFacadeAudit:
                 "todos": MockTodos
             }
 
+    @pytest.fixture
+    def mock_strategies(self, patched_strategies):
+        """Mocks compartidos por el módulo, con el historial de llamadas limpio en cada test."""
+        for mock in patched_strategies.values():
+            mock.reset_mock()
+        return patched_strategies
+
     @pytest.fixture
     def repo_structure(self, tmp_path):
         """Crea una estructura de repositorio controlada para pruebas de descubrimiento."""
@@ -118,21 +122,24 @@ class TestMetricsFacadeAudit:
         """
         toxic_file = repo_structure / "toxic.py"
         toxic_file.write_text("secret")
-        try:
-            toxic_file.chmod(0o000) # Simulación de error de permisos
-        except PermissionError:
-            pytest.skip("Restricción de entorno: No se pueden modificar permisos de archivos.")
+
+        # Simulación de error de permisos en la lectura (sin chmod: no depende del SO
+        # ni de si los tests corren como root)
+        real_read_text = Path.read_text
+        def read_text(path, *args, **kwargs):
+            if path.name == "toxic.py":
+                raise PermissionError(f"Permiso denegado: {path}")
+            return real_read_text(path, *args, **kwargs)
 
         facade = MetricsFacade()
         
-        results = facade.compute_all(repo_structure, options={})
+        with patch.object(Path, "read_text", autospec=True, side_effect=read_text):
+            results = facade.compute_all(repo_structure, options={})
         
         # El resumen debe reflejar que el proceso fue exitoso para los archivos legibles
         assert results["summary"]["num_files"] >= 2, \
             "El motor de análisis falló al intentar omitir archivos ilegibles."
-        
-        # Cleanup
-        toxic_file.chmod(0o777)
+        assert "toxic.py" not in [Path(f["path"]).name for f in results["files"]]
 
     # --------------------------------------------------------------------------
     # 4. PRUEBA DE CASOS LÍMITE (Repositorio Vacío)
@@ -1,11 +1,6 @@
 import pytest
-import sys
-import os
 import ast
 
-# Configuración del path para la importación del módulo de métricas
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-
 try:
     from metrics.functions import FunctionsStrategy
 except ImportError:
@@ -22,7 +17,7 @@ class TestFunctionsStrategyAudit:
     - Complejidad Ciclomática (CC).
     """
 
-    @pytest.fixture
+    @pytest.fixture(scope="module")
     def strategy(self):
         return FunctionsStrategy()
 
@@ -94,4 +89,27 @@ def my_func():
         loc = results["my_func"]["loc"]
         
         # La función abarca 4 líneas físicas según el parseo del AST en este bloque.
-        assert loc == 4, f"Error en cálculo de LOC. Obtenido: {loc}"
\ No newline at end of file
+        assert loc == 4, f"Error en cálculo de LOC. Obtenido: {loc}"
+
+    # --------------------------------------------------------------------------
+    # 4. VALIDACIÓN DE CC CON MATCH/CASE (Python 3.10+)
+    # --------------------------------------------------------------------------
+    def test_cyclomatic_complexity_modern_python(self, strategy):
+        """
+        Cada rama 'case' de una sentencia match abre un camino alternativo y
+        debe sumar un punto de complejidad ciclomática.
+        """
+        code = """
+def router(status):
+    match status:
+        case 200:
+            return "ok"
+        case 404:
+            return "not found"
+        case _:
+            return "error"
+"""
+        cc = strategy.compute(code)["router"]["cc"]
+
+        # 1 (camino base) + 3 ramas case
+        assert cc == 4, f"Error: CC con match/case incorrecta. Obtenido: {cc}"
@@ -1,9 +1,4 @@
 import pytest
-import sys
-import os
-
-# Configuración del path para la importación del módulo de métricas
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 try:
     from metrics.imports import NumImportsStrategy
@@ -19,7 +14,7 @@ class TestImportsStrategyAudit:
     ámbitos locales y la estabilidad ante entradas no válidas.
     """
 
-    @pytest.fixture
+    @pytest.fixture(scope="module")
     def strategy(self):
         return NumImportsStrategy()
 
@@ -84,4 +79,36 @@ def func():
         evitando fallos de ejecución inesperados mediante la validación de entrada.
         """
         with pytest.raises((ValueError, AttributeError, TypeError)):
-            strategy.compute(None)
\ No newline at end of file
+            strategy.compute(None)
+
+    # --------------------------------------------------------------------------
+    # 5. VALIDACIÓN DE TEXTO QUE NO ES CÓDIGO (Strings y Docstrings)
+    # --------------------------------------------------------------------------
+    def test_ignore_imports_inside_strings_and_docstrings(self, strategy):
+        """
+        Verifica que solo se cuenten sentencias import reales.
+        Las líneas que empiezan por 'import' o 'from' dentro de un docstring o de
+        un string multilínea no son dependencias y no deben contabilizarse.
+        """
+        code = '''
+"""
+import fake_module
+from the docs we know this
+"""
+import os
+PLANTILLA = """
+from jinja2 import Template
+"""
+'''
+        assert strategy.compute(code) == 1
+
+    def test_shared_tree_matches_compute(self, strategy):
+        """
+        Verifica que compute_lines con el AST compartido (como hace la fachada)
+        dé el mismo conteo que compute, que parsea por su cuenta.
+        """
+        import ast
+
+        code = "import os\nfrom sys import path\ndef f():\n    import json\n"
+        assert strategy.compute_lines(code, code.splitlines(), tree=ast.parse(code)) == \
+            strategy.compute(code) == 3
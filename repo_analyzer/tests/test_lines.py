@@ -1,11 +1,4 @@
 import pytest
-import sys
-import os
-
-# --- PREPARACIÓN DEL ENTORNO ---
-# Aseguramos que la raíz del proyecto esté en el path para la correcta
-# localización de los módulos de métricas.
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 try:
     from metrics.lines import LinesStrategy
@@ -22,7 +15,7 @@ class TestLinesStrategyAudit:
     seguro ante entradas inesperadas o volúmenes masivos de datos.
     """
 
-    @pytest.fixture
+    @pytest.fixture(scope="module")
     def strategy(self):
         return LinesStrategy()
 
@@ -1,26 +1,20 @@
 import pytest
-from unittest.mock import MagicMock, patch
+from unittest.mock import DEFAULT, MagicMock, patch
+from types import SimpleNamespace
 import sys
-import os
 
 # ==============================================================================
 # CONFIGURACIÓN DEL ENTORNO DE PRUEBAS
 # ==============================================================================
 
-# 1. Localización de la raíz del proyecto para asegurar importaciones correctas
-current_dir = os.path.dirname(os.path.abspath(__file__))
-project_root = os.path.dirname(current_dir)
-
-if project_root not in sys.path:
-    sys.path.insert(0, project_root)
-
-# 2. Aislamiento de dependencias externas (Flask)
+# Aislamiento de dependencias externas (Flask)
 # Se mockea globalmente para permitir la ejecución de lógica pura del Mediador
 mock_flask = MagicMock()
 sys.modules["flask"] = mock_flask
 
 try:
-    from ui.mediator import UIMediator
+    from ui.mediator import UIMediator, HistoryComponent
+    from proxy.subject_interface import SubjectInterface
 except ImportError as e:
     pytest.fail(f"ERROR DE SISTEMA: No se encuentra el módulo 'ui'. Verifique el PYTHONPATH. Detalle: {e}")
 
@@ -37,26 +31,41 @@ class TestUIMediator:
     @pytest.fixture
     def mock_subject(self):
         """Provee un doble de prueba para la lógica de negocio (Proxy/Subject)."""
-        subject = MagicMock()
+        # spec: solo existen los métodos del interfaz, así una errata o un cambio de firma
+        # en el Mediador hace fallar el test en lugar de crear un atributo nuevo
+        subject = MagicMock(spec=SubjectInterface)
         subject.list_analyses.return_value = []
         subject.peticion.return_value = {}
         return subject
 
     @pytest.fixture
-    def mediator(self, mock_subject):
-        """Instancia el Mediador inyectando la dependencia del Subject."""
+    def mediator(self, mock_subject, ui):
+        """
+        Instancia el Mediador inyectando la dependencia del Subject. Depende de 'ui'
+        porque el Mediador crea sus componentes al construirse.
+        """
         return UIMediator(mock_subject)
 
+    @pytest.fixture
+    def ui(self):
+        """
+        Sustituye los componentes de la UI (con autospec, para que respeten la API real
+        de cada componente) y render_template, en lugar de apilar cinco decoradores @patch
+        en cada test.
+        """
+        with patch.multiple("ui.mediator", autospec=True, InputComponent=DEFAULT,
+                            OptionsComponent=DEFAULT, OutputComponent=DEFAULT,
+                            HistoryComponent=DEFAULT) as mocks, \
+                patch("ui.mediator.render_template") as render:
+            yield SimpleNamespace(Input=mocks["InputComponent"], Opts=mocks["OptionsComponent"],
+                                  Out=mocks["OutputComponent"], Hist=mocks["HistoryComponent"],
+                                  render=render)
+
     # ==========================================================================
     # VALIDACIÓN DE FLUJOS DE COORDINACIÓN
     # ==========================================================================
 
-    @patch("ui.mediator.render_template")
-    @patch("ui.mediator.HistoryComponent")
-    @patch("ui.mediator.OutputComponent")
-    @patch("ui.mediator.OptionsComponent")
-    @patch("ui.mediator.InputComponent")
-    def test_show_index_initialization(self, MockInput, MockOpts, MockOut, MockHist, mock_render, mediator, mock_subject):
+    def test_show_index_initialization(self, ui, mediator, mock_subject):
         """
         Valida la carga inicial del dashboard [GET /].
         Asegura que el Mediador:
@@ -64,21 +73,16 @@ class TestUIMediator:
         2. Renderice la vista base 'index.html' pasando los datos recuperados.
         """
         # Configuración del historial simulado
-        MockHist.return_value.get_entries.return_value = {"history": ["item_test"]}
+        ui.Hist.return_value.get_entries.return_value = {"history": ["item_test"]}
 
         mediator.show_index()
 
         # Verificación de la orquestación
-        MockHist.return_value.get_entries.assert_called_once_with(mock_subject)
-        assert mock_render.call_args[0][0] == "index.html"
-        assert mock_render.call_args[1]["history"] == ["item_test"]
-
-    @patch("ui.mediator.render_template")
-    @patch("ui.mediator.HistoryComponent")
-    @patch("ui.mediator.OutputComponent")
-    @patch("ui.mediator.OptionsComponent")
-    @patch("ui.mediator.InputComponent")
-    def test_handle_analyze_validation_failure(self, MockInput, MockOpts, MockOut, MockHist, mock_render, mediator, mock_subject):
+        ui.Hist.return_value.get_entries.assert_called_once_with(mock_subject)
+        assert ui.render.call_args[0][0] == "index.html"
+        assert ui.render.call_args[1]["history"] == ["item_test"]
+
+    def test_handle_analyze_validation_failure(self, ui, mediator, mock_subject):
         """
         Valida la protección de la lógica de negocio ante datos de entrada erróneos [POST /analyze].
         Garantiza que:
@@ -87,8 +91,8 @@ class TestUIMediator:
         3. Se retorna a la UI con los mensajes de error correspondientes.
         """
         # Simulación de fallo en validación de entrada
-        MockInput.return_value.parse.return_value = (None, "URL Inválida")
-        MockInput.return_value.context.return_value = {"input_error": "URL Inválida"}
+        ui.Input.return_value.parse.return_value = (None, "URL Inválida")
+        ui.Input.return_value.context.return_value = {"input_error": "URL Inválida"}
         
         form_data = {} 
 
@@ -96,15 +100,10 @@ class TestUIMediator:
 
         # El negocio debe permanecer intacto si la entrada es inválida
         mock_subject.peticion.assert_not_called()
-        assert mock_render.call_args[1]["input_error"] == "URL Inválida"
-
-    @patch("ui.mediator.ConfigSingleton") 
-    @patch("ui.mediator.render_template")
-    @patch("ui.mediator.HistoryComponent")
-    @patch("ui.mediator.OutputComponent")
-    @patch("ui.mediator.OptionsComponent")
-    @patch("ui.mediator.InputComponent")
-    def test_handle_analyze_success_flow(self, MockInput, MockOpts, MockOut, MockHist, mock_render, MockConfig, mediator, mock_subject):
+        assert ui.render.call_args[1]["input_error"] == "URL Inválida"
+
+    @patch("ui.mediator.ConfigSingleton")
+    def test_handle_analyze_success_flow(self, MockConfig, ui, mediator, mock_subject):
         """
         Valida el flujo completo de análisis exitoso [POST /analyze].
         Comprueba la cadena de mando del Mediador:
@@ -115,11 +114,11 @@ class TestUIMediator:
         """
         # Configuración de flujo exitoso
         url = "http://git.com/repo"
-        MockInput.return_value.parse.return_value = (url, None)
-        MockOpts.return_value.parse.return_value = {"force": True}
+        ui.Input.return_value.parse.return_value = (url, None)
+        ui.Opts.return_value.parse.return_value = {"force": True}
         MockConfig.get_instance.return_value.duplication_window = 10
         mock_subject.peticion.return_value = {"loc": 500}
-        MockOut.return_value.prepare.return_value = {"metrics": "ok"}
+        ui.Out.return_value.prepare.return_value = {"metrics": "ok"}
         
         form_data = {"repo_url": url}
 
@@ -127,5 +126,22 @@ class TestUIMediator:
 
         # Verificación de integridad de datos y flujo
         mock_subject.peticion.assert_called_once_with(url, force=True, options={"force": True})        
-        assert MockHist.return_value.get_entries.called
-        assert mock_render.call_args[1]["metrics"] == "ok"
\ No newline at end of file
+        assert ui.Hist.return_value.get_entries.called
+        assert ui.render.call_args[1]["metrics"] == "ok"
+
+    def test_history_entries_reused_until_invalidated(self, mock_subject):
+        """
+        Valida que HistoryComponent no vuelva a consultar el historial dentro del TTL
+        y que invalidate() (tras un análisis) fuerce una lectura nueva.
+        """
+        history = HistoryComponent(ttl=60.0)
+        mock_subject.list_analyses.return_value = ["a1"]
+
+        assert history.get_entries(mock_subject) == {"history": ["a1"]}
+        assert history.get_entries(mock_subject) == {"history": ["a1"]}
+        mock_subject.list_analyses.assert_called_once()
+
+        mock_subject.list_analyses.return_value = ["a1", "a2"]
+        history.invalidate()
+        assert history.get_entries(mock_subject) == {"history": ["a1", "a2"]}
+        assert mock_subject.list_analyses.call_count == 2
@@ -0,0 +1,26 @@
+import pytest
+import sys
+import os
+import subprocess
+
+from metrics.duplication import NUMBA_AVAILABLE
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+@pytest.mark.with_numba
+@pytest.mark.skipif(not NUMBA_AVAILABLE, reason="Numba no está instalado")
+def test_compiled_shingle_count():
+    """
+    Comprueba una vez el camino compilado de verdad con Numba.
+    El resto de la suite corre con NUMBA_DISABLE_JIT=1 (ver conftest.py), así que
+    este test lanza un subproceso con el JIT activado.
+    """
+    code = (
+        "from metrics.duplication import count_duplicated_shingles\n"
+        "assert count_duplicated_shingles(['A', 'B', 'A', 'B'], 2) == (2, 3)\n"
+        "assert count_duplicated_shingles(['A', 'B'], 3) == (0, 0)\n"
+    )
+    env = dict(os.environ, NUMBA_DISABLE_JIT="0")
+    completed = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, env=env,
+                               capture_output=True, text=True)
+    assert completed.returncode == 0, completed.stderr
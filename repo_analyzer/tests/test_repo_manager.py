@@ -0,0 +1,32 @@
+import pytest
+
+from repo.repo_manager import canonical_repo_key
+
+
+class TestCanonicalRepoKey:
+    """
+    La clave canónica identifica al repositorio en la BD y en la caché local:
+    todas las formas de escribir la misma URL deben dar la misma clave.
+    """
+
+    @pytest.mark.parametrize("url", [
+        "https://github.com/User/Repo",
+        "https://github.com/User/Repo.git",
+        "https://github.com/User/Repo/",
+        "https://github.com/User/Repo.git/",
+        "https://GitHub.com/USER/REPO",
+        "  https://github.com/user/repo  ",
+        "git@github.com:User/Repo.git",
+        "ssh://git@github.com/User/Repo.git",
+    ])
+    def test_url_variants_share_a_key(self, url):
+        assert canonical_repo_key(url) == "user/repo"
+
+    def test_git_inside_the_name_is_kept(self):
+        """Solo se quita el sufijo .git, no un '.git' en mitad del nombre."""
+        assert canonical_repo_key("https://github.com/user/user.github.io") == "user/user.github.io"
+
+    @pytest.mark.parametrize("url", ["https://github.com/", "https://github.com/.git", "   "])
+    def test_url_without_path_is_rejected(self, url):
+        with pytest.raises(ValueError):
+            canonical_repo_key(url)
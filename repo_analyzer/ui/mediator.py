@@ -1,28 +1,41 @@
 from flask import render_template
+import time
 from typing import Dict, Any, Tuple, Optional
-import sys
-import os
-
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# Como en repo/ y proxy/, la raíz del proyecto ya está en sys.path (la añaden app.py y
+# tests/conftest.py), así que no se modifica sys.path al importar el módulo
 from config import ConfigSingleton
 
+# Resultado de parse() para una URL vacía: siempre es el mismo, así que se crea una vez
+_EMPTY_URL_ERROR: Tuple[None, str] = (None, "Por favor, introduzca una URL válida del repositorio.")
+
 class InputComponent:
     def parse(self, form: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
         repo_url = form.get("repo_url", "").strip()
         if not repo_url:
-            return None, "Por favor, introduzca una URL válida del repositorio."
+            return _EMPTY_URL_ERROR
         return repo_url, None
 
     def context(self, error: Optional[str] = None) -> Dict[str, Any]:
         return {"input_error": error}
 
 class OptionsComponent:
+    def __init__(self):
+        self._default_window: Optional[int] = None
+        self._default_context: Optional[Dict[str, Any]] = None
+
+    def _get_default_window(self) -> int:
+        # La configuración no cambia en ejecución: se lee una vez por componente.
+        # Si falla no se guarda el valor por defecto, y se reintenta en la siguiente llamada
+        if self._default_window is None:
+            try:
+                self._default_window = ConfigSingleton.get_instance().duplication_window
+            except Exception:
+                return 4
+        return self._default_window
+
     def parse(self, form: Dict[str, Any]) -> Dict[str, Any]:
         force = form.get("force") == "on"
-        try:
-            default_window = ConfigSingleton.get_instance().duplication_window
-        except Exception:
-            default_window = 4
+        default_window = self._get_default_window()
 
         try:
             val = form.get("dup_window")
@@ -36,17 +49,25 @@ class OptionsComponent:
         return {"force": force, "dup_window": dup_window}
 
     def context(self, parsed_options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        try:
-            default_window = ConfigSingleton.get_instance().duplication_window
-        except Exception:
-            default_window = 4
-        defaults = {"force": False, "dup_window": default_window}
-        return {"options": parsed_options or defaults}
+        if parsed_options:
+            return {"options": parsed_options}
+        # Sin opciones el contexto es siempre el mismo: se construye una vez, y solo si
+        # la configuración se pudo leer (si no, se reintenta en la siguiente llamada)
+        if self._default_context is None:
+            context = {"options": {"force": False, "dup_window": self._get_default_window()}}
+            if self._default_window is None:
+                return context
+            self._default_context = context
+        return self._default_context
+
+# Contexto de salida cuando aún no hay resultado. Es el mismo objeto en cada petición:
+# el Mediador solo lo desempaqueta (**) al montar el contexto, nunca lo modifica
+_EMPTY_OUTPUT: Dict[str, Any] = {"show_output": False}
 
 class OutputComponent:
     def prepare(self, result: Optional[Dict[str, Any]]) -> Dict[str, Any]:
         if not result:
-            return {"show_output": False}
+            return _EMPTY_OUTPUT
         
         summary = result.get("summary", {})
         
@@ -73,48 +94,70 @@ class OutputComponent:
             ]
         }
 
+# Segundos durante los que se reutiliza el historial ya leído. Tras un análisis el
+# Mediador lo invalida, así que el nuevo resultado aparece siempre en la siguiente vista
+HISTORY_TTL = 1.0
+# Contexto de historial vacío (instalación nueva o fallo al leerlo), compartido entre peticiones
+_EMPTY_HISTORY: Dict[str, Any] = {"history": ()}
+
 class HistoryComponent:
+    def __init__(self, ttl: float = HISTORY_TTL):
+        self._ttl = ttl
+        self._cached: Optional[Dict[str, Any]] = None
+        self._cached_subject = None
+        self._cached_at = 0.0
+
+    def invalidate(self) -> None:
+        self._cached = None
+
     def get_entries(self, subject) -> Dict[str, Any]:
+        now = time.monotonic()
+        if (self._cached is not None and self._cached_subject is subject
+                and now - self._cached_at < self._ttl):
+            return self._cached
         try:
             entries = subject.list_analyses()
         except Exception:
-            entries = []
-        return {"history": entries}
+            # Un fallo no se guarda: la siguiente petición vuelve a intentarlo
+            return _EMPTY_HISTORY
+        self._cached = {"history": entries} if entries else _EMPTY_HISTORY
+        self._cached_subject = subject
+        self._cached_at = now
+        return self._cached
 
 class UIMediator:
     def __init__(self, subject):
         self.subject = subject
+        # Los componentes no guardan estado de ninguna petición concreta (como mucho cachean
+        # la configuración o el historial), así que se crean una vez y se reutilizan
+        self._input = InputComponent()
+        self._options = OptionsComponent()
+        self._output = OutputComponent()
+        self._history = HistoryComponent()
+
+    def _render(self, error: Optional[str] = None,
+                parsed_options: Optional[Dict[str, Any]] = None,
+                result: Optional[Dict[str, Any]] = None):
+        """
+        Monta la vista index.html con el contexto de los cuatro componentes.
+        Los contextos se pasan directamente como kwargs (sus claves no se solapan),
+        sin montar antes un dict intermedio.
+        """
+        return render_template("index.html", **self._input.context(error),
+                               **self._options.context(parsed_options),
+                               **self._output.prepare(result),
+                               **self._history.get_entries(self.subject))
 
     def show_index(self):
-        input_c = InputComponent()
-        options_c = OptionsComponent()
-        output_c = OutputComponent()
-        history_c = HistoryComponent()
-
-        ctx = {}
-        ctx.update(input_c.context())
-        ctx.update(options_c.context())
-        ctx.update(output_c.prepare(None))
-        ctx.update(history_c.get_entries(self.subject))
-        return render_template("index.html", **ctx)
+        return self._render()
 
     def handle_analyze(self, form: Dict[str, Any]):
-        input_c = InputComponent()
-        options_c = OptionsComponent()
-        output_c = OutputComponent()
-        history_c = HistoryComponent()
-
-        repo_url, error = input_c.parse(form)
+        repo_url, error = self._input.parse(form)
         
         if error:
-            ctx = {}
-            ctx.update(input_c.context(error))
-            ctx.update(options_c.context()) 
-            ctx.update(output_c.prepare(None))
-            ctx.update(history_c.get_entries(self.subject))
-            return render_template("index.html", **ctx)
+            return self._render(error=error)
 
-        opts = options_c.parse(form)
+        opts = self._options.parse(form)
 
         try:
             result = self.subject.peticion(
@@ -124,19 +167,8 @@ class UIMediator:
             )
         except Exception as e:
             error_msg = f"Error durante el análisis: {str(e)}"
-            ctx = {}
-            ctx.update(input_c.context(error_msg))
-            ctx.update(options_c.context(opts))
-            ctx.update(output_c.prepare(None))
-            ctx.update(history_c.get_entries(self.subject))
-            return render_template("index.html", **ctx)
-
-        out_ctx = output_c.prepare(result)
-        hist_ctx = history_c.get_entries(self.subject)
-
-        ctx = {}
-        ctx.update(input_c.context())
-        ctx.update(options_c.context(opts))
-        ctx.update(out_ctx)
-        ctx.update(hist_ctx)
-        return render_template("index.html", **ctx)
+            return self._render(error=error_msg, parsed_options=opts)
+
+        # El análisis recién hecho (o recién forzado) debe verse ya en el historial
+        self._history.invalidate()
+        return self._render(parsed_options=opts, result=result)